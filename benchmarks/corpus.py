@@ -0,0 +1,223 @@
+"""
+Synthetic PDF corpus for the extractor benchmarks, generated offline with PyMuPDF.
+
+Every file gets an entry in manifest.json with the records extract_pdf_records should return
+(one dict, or a list for multi-shipment bundles), so the benchmark can report accuracy next to
+latency.
+"""
+import json
+import random
+import string
+from pathlib import Path
+
+import fitz
+
+PAGE_W, PAGE_H = 612, 792
+FONT_SIZE = 9
+
+FILLER_WORDS = (
+    "SEAL ASSY BRACKET BOLT WASHER NUT HOSE FITTING GASKET RETAINER SPACER CLAMP "
+    "INSPECTED PACKED QTY EACH LOT SERIAL CERTIFICATE CONFORMANCE STOCKROOM LEVEL"
+).split()
+
+# ---------------------- Carrier numbers with valid check digits ----------------------
+def _ups_check_digit(body15: str) -> str:
+    total = 0
+    for i, ch in enumerate(body15):
+        v = int(ch) if ch.isdigit() else (ord(ch) - 63) % 10
+        total += v * 2 if i % 2 else v
+    return str((10 - total % 10) % 10)
+
+def ups_number(rng: random.Random) -> str:
+    body = "".join(rng.choice(string.ascii_uppercase[:8] + string.digits) for _ in range(6))
+    body += "".join(rng.choice(string.digits) for _ in range(9))
+    return "1Z" + body + _ups_check_digit(body)
+
+def fedex_number(rng: random.Random) -> str:
+    body = "".join(rng.choice(string.digits) for _ in range(11))
+    weights = [1, 3, 7]
+    total = sum(int(d) * weights[i % 3] for i, d in enumerate(reversed(body)))
+    return body + str(total % 11 % 10)
+
+# ---------------------- Page builders ----------------------
+def _write_lines(page, lines: list[str], x: float = 36, y: float = 40, leading: float = 12):
+    for ln in lines:
+        page.insert_text((x, y), ln, fontsize=FONT_SIZE, fontname="helv")
+        y += leading
+
+def _tsa_lines(ref: str, order: str, claim: str, dims: str, weight: str) -> list[str]:
+    lines = [
+        "1. REFERENCE NO.            TRANSFER AND SHIPPING AUTHORIZATION         2. PAGE 1 OF 1",
+        ref,
+        "3. DATE SHIPPED 06/03/2025   4. ROUTING   5. BILL OF LADING   7. TRANS PAY. C",
+        "8. CONTRACT NO.   9. ORDER NO.   10. CHARGE LINE   11. MODE OF SHIP",
+        f"EX-305            {order}           QABZJB41",
+        "17. SHIPPED FROM CODE 3XTC5",
+        "THE BOEING COMPANY",
+        "C/O XPO LOGISTICS",
+        "800 ARLINGTON BLVD",
+        "SWEDESBORO NJ 08085-1700",
+        "19. SHIPPED TO CODE KLINE",
+        "ITOCHU AVIATION INC",
+        "21. ITEM NO. 22. STOCK AND / OR PART NUMBER 23. QUANTITY 24. UOM",
+        "SEAL 114E2158-12 QTY 10 EA",
+        "26. TOTAL PRICE 4,455.30",
+    ]
+    if claim:
+        lines.append(f"CLAIM: {claim}")
+    lines += [
+        f"27. BOEING INTERNAL USE DLVRY INSTR: {order}",
+        f"CARTON {dims} {weight} (lbs)",
+        "MS2: K4148SC7TAE21",
+    ]
+    return lines
+
+def _label_lines(carrier: str, number: str, ref: str) -> list[str]:
+    if carrier == "UPS":
+        grouped = f"{number[:2]} {number[2:5]} {number[5:8]} {number[8:10]} {number[10:14]} {number[14:]}"
+        return [
+            "SHIP TO: K LINE LOGISTICS (ITOCHU AVIATION)",
+            "145-68 228TH STREET SPRINGFIELD GARDENS NY 11413",
+            "UPS GROUND",
+            f"TRACKING #: {grouped}",
+            f"REF: {ref}",
+        ]
+    return [
+        "FROM: BDS GLOBAL LOGISTICS",
+        "THE BOEING CO C/O GXO LOGISTICS",
+        "TRK#",
+        f"{number[:4]} {number[4:8]} {number[8:]}",
+        f"REF: {ref}",
+        "ACTWGT: 2.00 LB",
+    ]
+
+def _filler_lines(rng: random.Random, n: int = 40) -> list[str]:
+    return [" ".join(rng.choice(FILLER_WORDS) for _ in range(rng.randint(4, 10))) for _ in range(n)]
+
+def _add_text_page(doc, lines: list[str]):
+    page = doc.new_page(width=PAGE_W, height=PAGE_H)
+    _write_lines(page, lines)
+
+def _add_scanned_page(doc, lines: list[str], zoom: float = 2.0):
+    """Image-only page: render the text in a scratch doc, then embed just the bitmap."""
+    scratch = fitz.open()
+    _add_text_page(scratch, lines)
+    pix = scratch[0].get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+    scratch.close()
+    page = doc.new_page(width=PAGE_W, height=PAGE_H)
+    page.insert_image(page.rect, stream=pix.tobytes("png"))
+
+def _noisy(s: str, rng: random.Random) -> str:
+    """Typical OCR'd-text-layer damage that the TSA normalizer is meant to undo."""
+    return s.replace("-", rng.choice(["•", "·", "–", "-"]))
+
+# ---------------------- Corpus ----------------------
+KINDS = [
+    "phcdt_ups", "phcdt_fedex", "phbbt_claim", "phbbt_noisy",
+    "scanned_label", "scanned_tsa", "bundle", "bundle_large", "late_tsa",
+]
+# Shipments per bundle_large file; with their filler pages it passes STREAM_MIN_PAGES (100)
+LARGE_BUNDLE_SHIPMENTS = 3
+
+def _shipment(kind: str, rng: random.Random) -> tuple[list[str], list[str], dict]:
+    """(TSA page lines, label page lines, expected fields) of one consignment."""
+    digits = "".join(rng.choice(string.digits) for _ in range(8))
+    dims = f"{rng.randint(4, 30)} X {rng.randint(4, 30)} X {rng.randint(2, 20)}"
+    weight = str(rng.randint(1, 60))
+    carrier = rng.choice(["UPS", "FEDEX"]) if kind in ("scanned_label", "scanned_tsa", "bundle") else (
+        "FEDEX" if kind == "phcdt_fedex" else "UPS")
+    number = ups_number(rng) if carrier == "UPS" else fedex_number(rng)
+    number_out = number if carrier == "UPS" else f"{number[:4]} {number[4:8]} {number[8:]}"
+
+    if kind.startswith("phbbt"):
+        ref = f"PHBBT-{digits[:7]}"
+        order = f"507{rng.choice('ABCK')}{rng.randint(10, 99)}-8H{rng.randint(1000, 9999)}"
+        claim = order
+    else:
+        ref = f"PHCDT-{digits}"
+        order = f"8H{rng.randint(1000, 9999)}"
+        claim = ""
+
+    tsa = _tsa_lines(ref, order, claim, dims, weight)
+    label = _label_lines(carrier, number, ref)
+    if kind == "phbbt_noisy":
+        tsa = [_noisy(ln, rng) if ln.startswith(("CLAIM", "PHBBT")) else ln for ln in tsa]
+    expected = {
+        "reference_no": ref,
+        "order_no": order,
+        "carton_dimensions": dims.replace(" ", ""),
+        "carton_weight": f"{weight} LB",
+        "tracking_number": number_out,
+        "carrier": carrier,
+    }
+    return tsa, label, expected
+
+def _make_large_bundle(rng: random.Random):
+    """Several consignments in one file, each a TSA page, its label and ~50 pages of paperwork."""
+    doc = fitz.open()
+    expected = []
+    for _ in range(LARGE_BUNDLE_SHIPMENTS):
+        tsa, label, fields = _shipment("bundle", rng)
+        _add_text_page(doc, tsa)
+        _add_text_page(doc, label)
+        for _ in range(rng.randint(45, 55)):
+            _add_text_page(doc, _filler_lines(rng))
+        expected.append(fields)
+    return doc, expected, False
+
+def _make_late_tsa(rng: random.Random):
+    """
+    One consignment past STREAM_MIN_PAGES whose TSA comes after ~25 pages of paperwork, one of
+    them with a bare 6-digit lot number (a legacy order shape) that must not win.
+    """
+    doc = fitz.open()
+    tsa, label, expected = _shipment("late_tsa", rng)
+    before = rng.randint(20, 30)
+    for i in range(before):
+        lines = _filler_lines(rng)
+        if i == 3:
+            lines.insert(5, f"LOT {rng.randint(100000, 999999)} INSPECTED")
+        _add_text_page(doc, lines)
+    _add_text_page(doc, tsa)
+    _add_text_page(doc, label)
+    for _ in range(rng.randint(85, 95)):
+        _add_text_page(doc, _filler_lines(rng))
+    return doc, expected, False
+
+def _make_one(kind: str, rng: random.Random):
+    if kind == "bundle_large":
+        return _make_large_bundle(rng)
+    if kind == "late_tsa":
+        return _make_late_tsa(rng)
+    doc = fitz.open()
+    tsa, label, expected = _shipment(kind, rng)
+    if kind == "scanned_tsa":
+        _add_scanned_page(doc, tsa)
+    else:
+        _add_text_page(doc, tsa)
+    if kind == "scanned_label":
+        _add_scanned_page(doc, label)
+    else:
+        _add_text_page(doc, label)
+    if kind == "bundle":
+        for _ in range(rng.choice([8, 20, 40, 58])):
+            _add_text_page(doc, _filler_lines(rng))
+    needs_ocr = kind.startswith("scanned")
+    return doc, expected, needs_ocr
+
+def generate_corpus(out_dir, per_kind: int = 3, seed: int = 7) -> Path:
+    """Write per_kind PDFs of every kind plus manifest.json into out_dir; returns the manifest path."""
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    manifest = {}
+    for kind in KINDS:
+        for i in range(per_kind):
+            doc, expected, needs_ocr = _make_one(kind, rng)
+            name = f"{kind}-{i:02d}.pdf"
+            manifest[name] = {"kind": kind, "pages": len(doc), "needs_ocr": needs_ocr, "expected": expected}
+            doc.save(str(out / name), garbage=3, deflate=True)
+            doc.close()
+    path = out / "manifest.json"
+    path.write_text(json.dumps(manifest, indent=2))
+    return path
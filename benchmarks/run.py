@@ -0,0 +1,220 @@
+"""
+Extractor benchmark: per-file and per-stage latency, throughput, peak memory and accuracy
+over the synthetic corpus, with an optional comparison against a saved baseline.
+
+    python -m benchmarks.run                          # generate corpus (if needed) and run
+    python -m benchmarks.run --save-baseline bench_baseline.json
+    python -m benchmarks.run --baseline bench_baseline.json   # exit 1 on regression
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from extractor import extractor as ex
+from extractor import ocr_cache, order_stats
+
+from .corpus import generate_corpus
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Stages reported by extract_pdf_records(stats=...) (inclusive: "order" contains "tables")
+STAGES = ["text", "classify", "tsa", "scan", "tables", "tracking", "order"]
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def _peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def _isolate_state(state_dir: Path) -> None:
+    """
+    Keep the OCR cache and the order-strategy learning out of the measurement: the cache moves
+    to `state_dir` (unless disabled) and strategy stats stay in memory. The env vars reach
+    spawned OCR workers; the module settings cover this process, whose extractor is imported.
+    """
+    if ocr_cache.OCR_CACHE_PATH:
+        ocr_cache.OCR_CACHE_PATH = os.environ["ITOCHU_OCR_CACHE_PATH"] = str(state_dir / "ocr_cache.db")
+        ocr_cache._cache_pid = None
+    order_stats.ORDER_STATS_DB = False
+    os.environ["ITOCHU_ORDER_STATS"] = "0"
+
+def _reset_state() -> None:
+    """Before every run: empty OCR cache, no learned strategy costs, so each repeat measures the same thing."""
+    cache = ocr_cache.get_ocr_cache()
+    if cache is not None:
+        cache.clear()
+    order_stats._stats_pid = None
+
+def _extract(path: str, stats: dict) -> tuple[list[dict] | None, str | None]:
+    # the watcher's entry point: one record per shipment, streamed when the file is large
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return ex.extract_pdf_records(path, stats=stats), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+def _wrong_fields(expected: dict | list[dict], records: list[dict] | None) -> list[str]:
+    """Mismatched field names; "n:field" for shipment n of a bundle, "records" for a wrong count."""
+    if isinstance(expected, dict):
+        data = records[0] if records and len(records) == 1 else None
+        return sorted(k for k, v in expected.items() if not data or data.get(k) != v)
+    wrong = [] if records and len(records) == len(expected) else ["records"]
+    for n, fields in enumerate(expected, 1):
+        data = records[n - 1] if records and n <= len(records) else None
+        wrong += [f"{n}:{k}" for k, v in fields.items() if not data or data.get(k) != v]
+    return sorted(wrong)
+
+def run_benchmark(corpus_dir: Path, repeat: int = 3) -> dict:
+    manifest = json.loads((corpus_dir / "manifest.json").read_text())
+    files = []
+    elapsed = 0.0
+    total_pages = 0
+    for name, meta in manifest.items():
+        path = str(corpus_dir / name)
+        runs, stage_runs = [], []
+        for _ in range(repeat):
+            stats = {}
+            _reset_state()
+            t0 = time.perf_counter()
+            data, error = _extract(path, stats)
+            runs.append(time.perf_counter() - t0)
+            stage_runs.append(stats)
+        elapsed += sum(runs)
+        total_pages += meta["pages"] * repeat
+
+        # One extra, untimed run for memory: tracemalloc slows Python-heavy stages several-fold
+        _reset_state()
+        tracemalloc.start()
+        _extract(path, {})
+        peak_py = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        wrong = _wrong_fields(meta["expected"], data)
+        stages = {
+            s: round(statistics.median(r.get("stages_ms", {}).get(s, 0.0) for r in stage_runs), 2)
+            for s in STAGES
+        }
+        last = stage_runs[-1]
+        files.append({
+            "file": name,
+            "kind": meta["kind"],
+            "pages": meta["pages"],
+            "needs_ocr": meta["needs_ocr"],
+            "ms_median": round(statistics.median(runs) * 1000, 2),
+            "ms_min": round(min(runs) * 1000, 2),
+            "stages_ms": stages,
+            "ocr_pages": last.get("ocr_pages", 0),
+            "table_parses": last.get("table_parses", 0),
+            "stream_windows": last.get("stream_windows", 0),
+            "order_tier": last.get("order_tier"),
+            "tracking_tier": last.get("tracking_tier"),
+            "peak_py_kb": round(peak_py / 1024, 1),
+            "wrong_fields": wrong,
+            "error": error,
+        })
+    by_kind = {}
+    for f in files:
+        by_kind.setdefault(f["kind"], []).append(f["ms_median"])
+    latencies = [f["ms_median"] for f in files]
+    return {
+        "files": files,
+        "summary": {
+            "files": len(files),
+            "repeat": repeat,
+            "ocr_available": ex._ocr_available(),
+            "ms_p50": round(_percentile(latencies, 50), 2),
+            "ms_p95": round(_percentile(latencies, 95), 2),
+            "ms_max": round(max(latencies, default=0.0), 2),
+            "files_per_s": round(len(files) * repeat / elapsed, 2),
+            "pages_per_s": round(total_pages / elapsed, 1),
+            "peak_rss_mb": _peak_rss_mb(),
+            "stage_ms_total": {
+                s: round(sum(f["stages_ms"][s] for f in files), 1) for s in STAGES
+            },
+            "kind_ms_median": {k: round(statistics.median(v), 2) for k, v in by_kind.items()},
+            "files_with_wrong_fields": sum(1 for f in files if f["wrong_fields"]),
+        },
+    }
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions: per-kind median latency or throughput worse than baseline by > tolerance, or new wrong fields."""
+    problems = []
+    cur, base = result["summary"], baseline["summary"]
+    for kind, ms in cur["kind_ms_median"].items():
+        b = base["kind_ms_median"].get(kind)
+        if b and ms > b * (1 + tolerance):
+            problems.append(f"{kind}: median {ms:.1f} ms vs baseline {b:.1f} ms (+{(ms / b - 1) * 100:.0f}%)")
+    if cur["files_per_s"] < base["files_per_s"] * (1 - tolerance):
+        problems.append(f"throughput {cur['files_per_s']} files/s vs baseline {base['files_per_s']}")
+    base_wrong = {f["file"]: set(f["wrong_fields"]) for f in baseline["files"]}
+    for f in result["files"]:
+        new = set(f["wrong_fields"]) - base_wrong.get(f["file"], set())
+        if new:
+            problems.append(f"{f['file']}: newly wrong fields {sorted(new)}")
+    return problems
+
+def _print_report(result: dict) -> None:
+    print(f"{'file':<24} {'pages':>5} {'median ms':>10}  {'text':>7} {'tsa':>7} {'tables':>7} {'track':>7} {'order':>7}"
+          f"  {'order tier':<14} {'tracking tier':<14} wrong")
+    for f in result["files"]:
+        s = f["stages_ms"]
+        print(f"{f['file']:<24} {f['pages']:>5} {f['ms_median']:>10.1f}  {s['text']:>7.1f} {s['tsa']:>7.1f} "
+              f"{s['tables']:>7.1f} {s['tracking']:>7.1f} {s['order']:>7.1f}  {f['order_tier'] or '-':<14} "
+              f"{f['tracking_tier'] or '-':<14} {','.join(f['wrong_fields']) or '-'}")
+    print()
+    for k, v in result["summary"].items():
+        print(f"{k}: {v}")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", help="corpus folder (default: a fresh temp folder)")
+    parser.add_argument("--per-kind", type=int, default=3, help="PDFs generated per document kind")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per file (median is reported)")
+    parser.add_argument("--json", help="write the full result to this file")
+    parser.add_argument("--save-baseline", help="write the result as a baseline file")
+    parser.add_argument("--baseline", help="compare against this baseline; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown vs baseline (default 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:  # the OCR cache may still be open (Windows)
+        corpus = Path(args.corpus or tmp)
+        if not (corpus / "manifest.json").exists():
+            generate_corpus(corpus, per_kind=args.per_kind)
+        state_dir = Path(tmp) / "state"
+        state_dir.mkdir()
+        _isolate_state(state_dir)
+        result = run_benchmark(corpus, repeat=args.repeat)
+
+    _print_report(result)
+    for path in (args.json, args.save_baseline):
+        if path:
+            Path(path).write_text(json.dumps(result, indent=2))
+    if args.baseline:
+        problems = compare(result, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        if problems:
+            print("\nREGRESSIONS vs baseline:")
+            for p in problems:
+                print(f"  {p}")
+            return 1
+        print("\nNo regressions vs baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker
 from .models import Base
 import os
@@ -10,4 +10,21 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def init_db():
   Base.metadata.create_all(bind=engine)
+  _add_missing_columns()
+
+def _add_missing_columns():
+  """create_all() never alters existing tables; add columns introduced after a table was created."""
+  insp = inspect(engine)
+  for table in Base.metadata.sorted_tables:
+    if not insp.has_table(table.name):
+      continue
+    existing = {c["name"] for c in insp.get_columns(table.name)}
+    with engine.begin() as conn:
+      for column in table.columns:
+        if column.name in existing:
+          continue
+        col_type = column.type.compile(dialect=engine.dialect)
+        conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}'))
+        if column.index:
+          conn.execute(text(f'CREATE INDEX IF NOT EXISTS ix_{table.name}_{column.name} ON {table.name} ({column.name})'))
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Float
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -16,7 +16,54 @@ class ShipmentExtract(Base):
   carton_weight = Column(String)
   tracking_number = Column(String)
   carrier = Column(String)
+  content_hash = Column(String(64), index=True)
+  extractor_version = Column(String)
+  record_no = Column(Integer, default=0)      # position of this shipment within a multi-shipment PDF
+  record_count = Column(Integer, default=1)
+  job_id = Column(Integer, index=True)         # processing_jobs row that extracted it
   processed_at = Column(DateTime, default=datetime.now)
   processed = Column(Integer, default=0)
+  rcn_number = Column(String)                  # portal references returned when it was submitted
+  rc_num = Column(String)
 
-  
\ No newline at end of file
+  
+class OrderStrategyStat(Base):
+  __tablename__ = "order_strategy_stats"
+
+  doc_type = Column(String, primary_key=True)
+  strategy = Column(String, primary_key=True)
+  attempts = Column(Integer, default=0)
+  hits = Column(Integer, default=0)
+  contests = Column(Integer, default=0)
+  changed = Column(Integer, default=0)
+  timed = Column(Integer, default=0)
+  total_ms = Column(Float, default=0.0)
+  updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+
+class WatchedFile(Base):
+  __tablename__ = "watched_files"
+
+  path = Column(String, primary_key=True)
+  folder = Column(String, index=True, nullable=False)
+  size = Column(Integer)
+  mtime_ns = Column(Integer)
+  inode = Column(Integer)
+  stable_since = Column(Float)     # epoch seconds this (size, mtime, inode) was first seen
+  admitted_at = Column(Float)      # handed to the pipeline with this signature; NULL = not yet
+
+
+class ProcessingJob(Base):
+  __tablename__ = "processing_jobs"
+
+  id = Column(Integer, primary_key=True, autoincrement=True)
+  path = Column(String, index=True, nullable=False)
+  filename = Column(String, nullable=False)
+  content_hash = Column(String(64))
+  state = Column(String, index=True, nullable=False, default="queued")  # queued → extracting → extracted → submitting → submitted / failed
+  attempts = Column(Integer, default=0)          # claims of the current state (reset when a stage completes)
+  next_attempt_at = Column(DateTime)             # not claimable before this (retry backoff)
+  last_error = Column(String)
+  created_at = Column(DateTime, default=datetime.now)
+  updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+  finished_at = Column(DateTime)                 # file moved to completed/ or issue/
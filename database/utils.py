@@ -1,21 +1,361 @@
-from .models import ShipmentExtract
-from .db import SessionLocal
+import os
+from datetime import datetime
 
-def save_shipment(data: dict, filename: str):
+from sqlalchemy import func, inspect, or_
+from sqlalchemy.exc import IntegrityError
+
+from .models import ShipmentExtract, OrderStrategyStat, WatchedFile, ProcessingJob
+from .db import SessionLocal, engine
+
+EXTRACTED_FIELDS = [
+  "reference_no", "order_no", "shipped_from", "carton_dimensions",
+  "carton_weight", "tracking_number", "carrier",
+]
+
+def _shipment_entry(data: dict, filename: str, content_hash: str = None, extractor_version: str = None,
+                    record_no: int = 0, record_count: int = 1, job_id: int = None):
+  return ShipmentExtract(
+    filename=filename,
+    job_id=job_id,
+    content_hash=content_hash,
+    extractor_version=extractor_version,
+    record_no=record_no,
+    record_count=record_count,
+    reference_no=data.get("reference_no"),
+    order_no=data.get("order_no"),
+    shipped_from=data.get("shipped_from"),
+    carton_dimensions=data.get("carton_dimensions"),
+    carton_weight=data.get("carton_weight"),
+    tracking_number=data.get("tracking_number"),
+    carrier=data.get("carrier"),
+  )
+
+def save_shipment(data: dict, filename: str, content_hash: str = None, extractor_version: str = None):
   db = SessionLocal()
   try:
-    entry = ShipmentExtract(
-      filename=filename,
-      reference_no=data.get("reference_no"),
-      order_no=data.get("order_no"),
-      shipped_from=data.get("shipped_from"),
-      carton_dimensions=data.get("carton_dimensions"),
-      carton_weight=data.get("carton_weight"),
-      tracking_number=data.get("tracking_number"),
-      carrier=data.get("carrier"),
-    )
+    entry = _shipment_entry(data, filename, content_hash, extractor_version)
 
     db.add(entry)
     db.commit()
   finally:
-    db.close()
\ No newline at end of file
+    db.close()
+
+def save_shipments(records: list, filename: str, content_hash: str = None, extractor_version: str = None):
+  """Save every shipment extracted from one PDF in a single transaction; returns their ids in order."""
+  db = SessionLocal()
+  try:
+    entries = [
+      _shipment_entry(data, filename, content_hash, extractor_version, record_no=n, record_count=len(records))
+      for n, data in enumerate(records)
+    ]
+    db.add_all(entries)
+    db.commit()
+    return [entry.id for entry in entries]
+  finally:
+    db.close()
+
+def find_extractions(content_hash: str, extractor_version: str):
+  """All shipment records of the latest extraction of identical bytes (same extractor version), or None."""
+  db = SessionLocal()
+  try:
+    query = db.query(ShipmentExtract).filter_by(content_hash=content_hash, extractor_version=extractor_version)
+    latest = query.order_by(ShipmentExtract.id.desc()).first()
+    if not latest:
+      return None
+    records = []
+    for n in range(latest.record_count or 1):
+      match = ShipmentExtract.record_no == n
+      if n == 0:  # rows saved before record_no existed
+        match = or_(match, ShipmentExtract.record_no.is_(None))
+      entry = query.filter(match).order_by(ShipmentExtract.id.desc()).first()
+      if not entry:
+        return None
+      records.append({field: getattr(entry, field) for field in EXTRACTED_FIELDS})
+    return records
+  finally:
+    db.close()
+
+ORDER_STAT_COUNTERS = ["attempts", "hits", "contests", "changed", "timed", "total_ms"]
+
+def order_strategy_stats_ready():
+  """True once init_db() has created the stats table; never creates a SQLite file itself."""
+  url = engine.url
+  if url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:") and not os.path.exists(url.database):
+    return False
+  return inspect(engine).has_table(OrderStrategyStat.__tablename__)
+
+def load_order_strategy_stats():
+  """{(doc_type, strategy): {counter: total}} for the order-number dispatcher."""
+  db = SessionLocal()
+  try:
+    return {
+      (row.doc_type, row.strategy): {k: getattr(row, k) or 0 for k in ORDER_STAT_COUNTERS}
+      for row in db.query(OrderStrategyStat).all()
+    }
+  finally:
+    db.close()
+
+def add_order_strategy_stats(deltas: dict):
+  """Add {(doc_type, strategy): {counter: n}} to the stored totals (in-place UPDATE, safe across processes)."""
+  db = SessionLocal()
+  try:
+    for (doc_type, strategy), d in deltas.items():
+      values = {getattr(OrderStrategyStat, k): getattr(OrderStrategyStat, k) + d.get(k, 0) for k in ORDER_STAT_COUNTERS}
+      values[OrderStrategyStat.updated_at] = datetime.now()
+      rows = db.query(OrderStrategyStat).filter_by(doc_type=doc_type, strategy=strategy).update(values, synchronize_session=False)
+      if not rows:
+        try:
+          with db.begin_nested():
+            db.add(OrderStrategyStat(doc_type=doc_type, strategy=strategy, **{k: d.get(k, 0) for k in ORDER_STAT_COUNTERS}))
+        except IntegrityError:  # another process inserted it first
+          db.query(OrderStrategyStat).filter_by(doc_type=doc_type, strategy=strategy).update(values, synchronize_session=False)
+    db.commit()
+  finally:
+    db.close()
+
+
+WATCHED_FILE_FIELDS = ["size", "mtime_ns", "inode", "stable_since", "admitted_at"]
+
+def load_watched_files(folder: str):
+  """{path: {size, mtime_ns, inode, stable_since, admitted_at}} for one watch folder."""
+  db = SessionLocal()
+  try:
+    return {
+      row.path: {k: getattr(row, k) for k in WATCHED_FILE_FIELDS}
+      for row in db.query(WatchedFile).filter_by(folder=folder).all()
+    }
+  finally:
+    db.close()
+
+def save_watched_files(folder: str, changed: dict, removed=()):
+  """Upsert {path: fields} and drop `removed` paths in one transaction."""
+  db = SessionLocal()
+  try:
+    for path, fields in changed.items():
+      db.merge(WatchedFile(path=path, folder=folder, **{k: fields.get(k) for k in WATCHED_FILE_FIELDS}))
+    removed = list(removed)
+    for i in range(0, len(removed), 500):
+      db.query(WatchedFile).filter(WatchedFile.path.in_(removed[i:i + 500])).delete(synchronize_session=False)
+    db.commit()
+  finally:
+    db.close()
+
+
+JOB_QUEUED = "queued"
+JOB_EXTRACTING = "extracting"
+JOB_EXTRACTED = "extracted"
+JOB_SUBMITTING = "submitting"
+JOB_SUBMITTED = "submitted"
+JOB_FAILED = "failed"
+
+def _job_dict(job):
+  return {
+    "id": job.id, "path": job.path, "filename": job.filename, "state": job.state,
+    "attempts": job.attempts or 0, "last_error": job.last_error, "created_at": job.created_at,
+  }
+
+def enqueue_job(path: str, filename: str):
+  """Queue `path` unless an unfinished job already covers it; returns that job's id."""
+  db = SessionLocal()
+  try:
+    job = db.query(ProcessingJob).filter_by(path=path, finished_at=None).first()
+    if job is None:
+      job = ProcessingJob(path=path, filename=filename, state=JOB_QUEUED, attempts=0)
+      db.add(job)
+      db.commit()
+    return job.id
+  finally:
+    db.close()
+
+def latest_job_times(paths):
+  """{path: created_at of its newest job} for those of `paths` that have any job, finished or not."""
+  db = SessionLocal()
+  try:
+    paths = list(paths)
+    out = {}
+    for i in range(0, len(paths), 500):
+      rows = (
+        db.query(ProcessingJob.path, func.max(ProcessingJob.created_at))
+        .filter(ProcessingJob.path.in_(paths[i:i + 500]))
+        .group_by(ProcessingJob.path)
+        .all()
+      )
+      out.update(rows)
+    return out
+  finally:
+    db.close()
+
+def recover_jobs():
+  """
+  Startup, before any worker runs: put back jobs a crashed run left mid-stage.
+  Extraction simply restarts (its shipments are only saved together with the move to 'extracted').
+  An interrupted submission is failed instead: the portal may already hold that consignment.
+  Returns (requeued, failed).
+  """
+  db = SessionLocal()
+  try:
+    now = datetime.now()
+    requeued = (
+      db.query(ProcessingJob)
+      .filter_by(state=JOB_EXTRACTING, finished_at=None)
+      .update({"state": JOB_QUEUED, "updated_at": now}, synchronize_session=False)
+    )
+    failed = (
+      db.query(ProcessingJob)
+      .filter_by(state=JOB_SUBMITTING, finished_at=None)
+      .update({
+        "state": JOB_FAILED, "updated_at": now,
+        "last_error": "interrupted during portal submission; check the portal before re-dropping the PDF",
+      }, synchronize_session=False)
+    )
+    db.commit()
+    return requeued, failed
+  finally:
+    db.close()
+
+def claim_job(job_id: int, from_state: str, to_state: str) -> bool:
+  """Atomically move a due job from `from_state` to `to_state` and count the attempt; False if someone else got it."""
+  db = SessionLocal()
+  try:
+    now = datetime.now()
+    rows = (
+      db.query(ProcessingJob)
+      .filter(
+        ProcessingJob.id == job_id,
+        ProcessingJob.state == from_state,
+        ProcessingJob.finished_at.is_(None),
+        or_(ProcessingJob.next_attempt_at.is_(None), ProcessingJob.next_attempt_at <= now),
+      )
+      .update({"state": to_state, "attempts": ProcessingJob.attempts + 1, "updated_at": now}, synchronize_session=False)
+    )
+    db.commit()
+    return rows == 1
+  finally:
+    db.close()
+
+def update_job(job_id: int, **fields):
+  db = SessionLocal()
+  try:
+    fields["updated_at"] = datetime.now()
+    db.query(ProcessingJob).filter_by(id=job_id).update(fields, synchronize_session=False)
+    db.commit()
+  finally:
+    db.close()
+
+def due_jobs():
+  """Unfinished jobs with work to do now: claimable (queued / extracted, backoff over) or awaiting their file move."""
+  db = SessionLocal()
+  try:
+    now = datetime.now()
+    jobs = (
+      db.query(ProcessingJob)
+      .filter(
+        ProcessingJob.finished_at.is_(None),
+        or_(
+          ProcessingJob.state.in_([JOB_SUBMITTED, JOB_FAILED]),
+          ProcessingJob.state.in_([JOB_QUEUED, JOB_EXTRACTED])
+          & or_(ProcessingJob.next_attempt_at.is_(None), ProcessingJob.next_attempt_at <= now),
+        ),
+      )
+      .order_by(ProcessingJob.id)
+      .all()
+    )
+    return [_job_dict(job) for job in jobs]
+  finally:
+    db.close()
+
+def next_job_retry():
+  """When the earliest backed-off job becomes claimable again, or None."""
+  db = SessionLocal()
+  try:
+    job = (
+      db.query(ProcessingJob)
+      .filter(
+        ProcessingJob.finished_at.is_(None),
+        ProcessingJob.state.in_([JOB_QUEUED, JOB_EXTRACTED]),
+        ProcessingJob.next_attempt_at.isnot(None),
+      )
+      .order_by(ProcessingJob.next_attempt_at)
+      .first()
+    )
+    return job.next_attempt_at if job else None
+  finally:
+    db.close()
+
+def job_state_counts():
+  """{state: n} over unfinished jobs."""
+  db = SessionLocal()
+  try:
+    rows = (
+      db.query(ProcessingJob.state, func.count(ProcessingJob.id))
+      .filter(ProcessingJob.finished_at.is_(None))
+      .group_by(ProcessingJob.state)
+      .all()
+    )
+    return {state: n for state, n in rows}
+  finally:
+    db.close()
+
+def oldest_unfinished_job():
+  """created_at of the oldest job whose PDF is still in the watch folder, or None."""
+  db = SessionLocal()
+  try:
+    return db.query(func.min(ProcessingJob.created_at)).filter(ProcessingJob.finished_at.is_(None)).scalar()
+  finally:
+    db.close()
+
+def save_job_shipments(job_id: int, records: list, filename: str, content_hash: str = None,
+                       extractor_version: str = None):
+  """
+  Save a job's shipments and move it from 'extracting' to 'extracted' in one transaction,
+  so a crash leaves either both or neither. Returns the shipment ids in order.
+  """
+  db = SessionLocal()
+  try:
+    entries = [
+      _shipment_entry(data, filename, content_hash, extractor_version, record_no=n, record_count=len(records), job_id=job_id)
+      for n, data in enumerate(records)
+    ]
+    db.add_all(entries)
+    rows = (
+      db.query(ProcessingJob)
+      .filter_by(id=job_id, state=JOB_EXTRACTING)
+      .update({
+        "state": JOB_EXTRACTED, "content_hash": content_hash, "attempts": 0,
+        "next_attempt_at": None, "last_error": None, "updated_at": datetime.now(),
+      }, synchronize_session=False)
+    )
+    if rows != 1:
+      db.rollback()
+      raise RuntimeError(f"job {job_id} is no longer being extracted")
+    db.commit()
+    return [entry.id for entry in entries]
+  finally:
+    db.close()
+
+def job_submissions(job_id: int):
+  """[(fields, record_no, record_count, rcn_number, rc_num)] of a job's submitted shipments in record order."""
+  db = SessionLocal()
+  try:
+    query = db.query(ShipmentExtract).filter_by(job_id=job_id, processed=1)
+    return [
+      ({field: getattr(entry, field) for field in EXTRACTED_FIELDS}, entry.record_no or 0, entry.record_count or 1,
+       entry.rcn_number, entry.rc_num)
+      for entry in query.order_by(ShipmentExtract.record_no).all()
+    ]
+  finally:
+    db.close()
+
+def job_shipments(job_id: int, pending_only: bool = True):
+  """[(shipment_id, fields, record_no, record_count)] of a job in record order; by default only unsubmitted ones."""
+  db = SessionLocal()
+  try:
+    query = db.query(ShipmentExtract).filter_by(job_id=job_id)
+    if pending_only:
+      query = query.filter(or_(ShipmentExtract.processed.is_(None), ShipmentExtract.processed == 0))
+    return [
+      (entry.id, {field: getattr(entry, field) for field in EXTRACTED_FIELDS}, entry.record_no or 0, entry.record_count or 1)
+      for entry in query.order_by(ShipmentExtract.record_no).all()
+    ]
+  finally:
+    db.close()
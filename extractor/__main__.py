@@ -0,0 +1,59 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+from .batch import extract_many
+from .extractor import EXTRACTOR_VERSION, content_hash
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m extractor",
+        description="Extract shipment fields from every PDF in a folder; one JSON line per PDF with a list of its shipment records.",
+    )
+    parser.add_argument("folder", help="folder containing PDFs")
+    parser.add_argument("--pattern", default="*.pdf", help="glob for PDFs inside the folder (default: *.pdf)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("-o", "--out", default="-", help="JSONL output file (default: stdout)")
+    parser.add_argument("--save", action="store_true", help="also save successful extractions to shipment_extracts")
+    args = parser.parse_args(argv)
+
+    paths = sorted(Path(args.folder).glob(args.pattern))
+    if not paths:
+        print(f"No PDFs matching {args.pattern} in {args.folder}", file=sys.stderr)
+        return 1
+
+    if args.save:
+        from database.db import init_db
+        from database.utils import save_shipments
+        init_db()
+
+    out = sys.stdout if args.out == "-" else open(args.out, "a", encoding="utf-8")
+    started = time.perf_counter()
+    n_ok = n_failed = 0
+    try:
+        for result in extract_many(paths, workers=args.workers):
+            if result["ok"]:
+                n_ok += 1
+                if args.save:
+                    save_shipments(
+                        result["records"],
+                        filename=result["file"],
+                        content_hash=content_hash(result["path"]),
+                        extractor_version=EXTRACTOR_VERSION,
+                    )
+            else:
+                n_failed += 1
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"{n_ok} extracted, {n_failed} failed in {elapsed:.1f}s ({len(paths) / elapsed:.2f} PDFs/s)", file=sys.stderr)
+    return 0 if not n_failed else 2
+
+if __name__ == "__main__":
+    sys.exit(main())
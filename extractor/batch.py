@@ -0,0 +1,47 @@
+import contextlib
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterable, Iterator
+
+from .extractor import extract_pdf_records, _filename
+
+def _extract_one(pdf_path: str) -> dict:
+    """
+    Worker entrypoint: never raises, so one bad PDF can't take down the batch.
+    "records" holds one dict per shipment (a bundle can carry several), as the watcher sees them.
+    Extractor logging goes to stderr, keeping stdout free for JSONL.
+    """
+    started = time.perf_counter()
+    stats = {}
+    result = {"file": _filename(pdf_path), "path": pdf_path, "ok": False, "records": None, "error": None, "stats": stats}
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            result["records"] = extract_pdf_records(pdf_path, stats=stats)
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = {
+            "type": type(e).__name__,
+            "message": str(e),
+            "traceback": traceback.format_exc(),
+        }
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+def extract_many(paths: Iterable[str], workers: int | None = None) -> Iterator[dict]:
+    """
+    Extract many PDFs across a process pool, yielding one result dict per file as soon
+    as it finishes (completion order, not input order). workers=1 runs in-process.
+    """
+    paths = [str(p) for p in paths]
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(paths) <= 1:
+        for p in paths:
+            yield _extract_one(p)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+        futures = [pool.submit(_extract_one, p) for p in paths]
+        for fut in as_completed(futures):
+            yield fut.result()
@@ -1,29 +1,46 @@
+import os
 import re
-import io
-from typing import Optional
-
-import fitz
-import tabula
-import pandas as pd
+import hashlib
+import importlib
+import bisect
+import json
+import multiprocessing
+import time
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from typing import Optional, Sequence
+
+from .ocr_cache import get_ocr_cache, ocr_cache_key
+from .ocr_engine import get_ocr_engine, words_to_text
+from .order_stats import get_order_stats
+
+# ---------------------- Heavy backends (loaded on first use) ----------------------
+class _LazyModule:
+    """Module stand-in that imports the real module on first attribute access."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+fitz = _LazyModule("fitz")
+tabula = _LazyModule("tabula")
 
 # ---------------------- OCR (optional but recommended) ----------------------
-_OCR_AVAILABLE = False
-_OCR_REASON = "pytesseract not imported"
-try:
-    import pytesseract
-    pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-    from PIL import Image
+def _ocr_status() -> tuple[bool, str, str]:
+    """(available, reason, engine + version) of this process's OCR engine, set up on first need."""
+    engine, reason = get_ocr_engine()
+    return engine is not None, reason, engine.name if engine is not None else ""
 
-    try:
-        _ = pytesseract.get_tesseract_version()
-        _OCR_AVAILABLE = True
-        _OCR_REASON = "ok"
-    except Exception as e:
-        _OCR_AVAILABLE = False
-        _OCR_REASON = f"Tesseract binary not found: {e}"
-except Exception as e:
-    _OCR_AVAILABLE = False
-    _OCR_REASON = f"Import error: {e}"
+def _ocr_available() -> bool:
+    return _ocr_status()[0]
+
+# Bump whenever extraction rules change, so cached results (keyed by content hash) are not reused
+EXTRACTOR_VERSION = "7"
 
 # ---------------------- Core Patterns ----------------------
 PH_REF_PATTERN = r"(PHCDT|PHBBT)[-\s]?\d{6,9}"
@@ -40,7 +57,24 @@ ORDERISH_TOKEN = r"\b([A-Z0-9][A-Z0-9\-_]{5,23})\b"
 
 # UPS & FedEx
 UPS_CANONICAL_LEN = 18  # "1Z" + 16 alnum
+UPS_PATTERN = r"1Z[\s0-9A-Z\-]{8,50}"
 FEDEX_NUMERIC_PATTERN = r"\b(\d{12}|\d{15}|\d{20})\b"
+FEDEX_444_PATTERN = r"\b(\d{4}\s\d{4}\s\d{4})\b"
+
+# Pieces of WEIGHT_PATTERN, scanned separately (no DOTALL '.*?' between them)
+LAST_DIM_PATTERN = r"\d{1,3}(?:\.\d{1,2})?"
+CARTON_DIM_PATTERN = r"CARTON\s+\d{1,3}(?:\.\d{1,2})?\s*[Xx×]\s*\d{1,3}(?:\.\d{1,2})?\s*[Xx×]\s*(\d{1,3}(?:\.\d{1,2})?)"
+LBS_PATTERN = r"(\d{1,4}(?:\.\d{1,2})?)\s*(?:\(?LBS?\)?|\(LBS\))"
+
+# TSA-window order patterns (CLAIM near 26 → 27, preferred 507xxx-8Hxxxx, generic 6 + 6)
+TSA_CLAIM_ORDER_PATTERN = r"CLAIM[:\s]+([56]07[A-Z0-9]{3})[-\s]?((?:8H)[A-Z0-9]{4})"
+TSA_507_ORDER_PATTERN = r"\b(507[A-Z0-9]{3})[-\s]?((?:8H)[A-Z0-9]{4})\b"
+TSA_SIX_SIX_PATTERN = r"\b([0-9]{6})[-\s]?([A-Z0-9]{6})\b"
+NOISY_PHBBT_PATTERN = r"[A-Z\?\./]{0,3}HBBT[-\s]?(\d{6,9})"
+
+LEGACY_SIX_PATTERN = r"\b\d{6}\b"
+PHCDT_LABEL_HINT = "9 ORDER NO."
+PHBBT_LABEL_HINT = "10 CHARGE LINE"
 
 # ---------------------- Utils ----------------------
 def _u(s: str) -> str:
@@ -52,12 +86,257 @@ def _clean(s: str) -> str:
 def _filename(pdf_path: str) -> str:
     return pdf_path.replace("\\", "/").split("/")[-1]
 
-def _finditer_ignorecase(hay: str, needle: str):
-    return re.finditer(re.escape(needle.upper()), hay, flags=re.IGNORECASE)
+def content_hash(pdf_path: str) -> str:
+    """sha256 of the file bytes; identical PDFs hash the same wherever they are dropped."""
+    h = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+# ---------------------- Per-extraction stats ----------------------
+class _ExtractStats:
+    """Stage timings, cost counters and winning fallback tiers for one extract_pdf_data call."""
+
+    def __init__(self):
+        self.stages_ms: dict[str, float] = {}
+        self.counters = {"pages": 0, "ocr_pages": 0, "table_parses": 0, "tabula_calls": 0}
+        self.tiers: dict[str, Optional[str]] = {"order_no": None, "tracking_number": None}
+        self.page_kinds: dict[str, int] = {}
+        # None: record each order dispatch as it runs; a list: hold them here for the caller
+        self.order_log: Optional[list] = None
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages_ms[name] = self.stages_ms.get(name, 0.0) + (time.perf_counter() - t0) * 1000
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def as_dict(self) -> dict:
+        return {
+            "stages_ms": {k: round(v, 2) for k, v in self.stages_ms.items()},
+            **self.counters,
+            "order_tier": self.tiers["order_no"],
+            "tracking_tier": self.tiers["tracking_number"],
+            "page_kinds": dict(self.page_kinds),
+        }
+
+# ---------------------- Single-pass field scanner ----------------------
+class _FieldScanner:
+    """
+    Finds every field candidate in one left-to-right walk. All patterns are compiled into one
+    alternation; wherever it stops, each field's own pattern is tried at that offset, so
+    overlapping candidates of different kinds are all kept with their offsets.
+    The first candidate of a kind is exactly what re.search(pattern) would return.
+    """
+
+    def __init__(self, specs: list[tuple[str, str, int]]):
+        self._specs = [(kind, re.compile(pat, flags)) for kind, pat, flags in specs]
+        self._any = re.compile("|".join(
+            f"(?i:{pat})" if flags & re.IGNORECASE else f"(?:{pat})" for _, pat, flags in specs
+        ))
+
+    def scan(self, text: str) -> "_Candidates":
+        hits: dict[str, list[re.Match]] = {kind: [] for kind, _ in self._specs}
+        search = self._any.search
+        m = search(text)
+        while m:
+            at = m.start()
+            for kind, rx in self._specs:
+                mk = rx.match(text, at)
+                if mk:
+                    hits[kind].append(mk)
+            m = search(text, at + 1)
+        return _Candidates(text, hits)
+
+class _Candidates:
+    """Field candidates of one scanned text, per kind, in offset order."""
+
+    def __init__(self, text: str, hits: dict[str, list[re.Match]]):
+        self.text = text
+        self._hits = hits
+
+    def all(self, kind: str) -> list[re.Match]:
+        return self._hits.get(kind, [])
+
+    def first(self, kind: str) -> Optional[re.Match]:
+        hits = self._hits.get(kind)
+        return hits[0] if hits else None
+
+    def first_within(self, kind: str, start: int, end: int) -> Optional[re.Match]:
+        for m in self._hits.get(kind, []):
+            if m.start() >= end:
+                break
+            if m.start() >= start and m.end() <= end:
+                return m
+        return None
+
+    def non_overlapping(self, kind: str) -> list[re.Match]:
+        """Same hits re.finditer would yield (each search resumes after the previous match)."""
+        out, last_end = [], 0
+        for m in self._hits.get(kind, []):
+            if m.start() >= last_end:
+                out.append(m)
+                last_end = m.end()
+        return out
+
+_I = re.IGNORECASE
+_TEXT_SCANNER = _FieldScanner([
+    ("ref", PH_REF_PATTERN, 0),
+    ("ref_noisy", NOISY_PHBBT_PATTERN, 0),
+    ("dims", DIM_PATTERN, 0),
+    ("carton", CARTON_DIM_PATTERN, _I),
+    ("lbs", LBS_PATTERN, _I),
+    ("phcdt_order", PHCDT_ORDER_PATTERN, _I),
+    ("phbbt_order", PHBBT_ORDER_PATTERN, _I),
+    ("legacy_six", LEGACY_SIX_PATTERN, _I),
+    ("phcdt_hint", re.escape(PHCDT_LABEL_HINT), _I),
+    ("phbbt_hint", re.escape(PHBBT_LABEL_HINT), _I),
+    ("tsa_claim", TSA_CLAIM_ORDER_PATTERN, 0),
+    ("tsa_507", TSA_507_ORDER_PATTERN, 0),
+    ("tsa_six_six", TSA_SIX_SIX_PATTERN, 0),
+] + [(f"order_label_{i}", lab, _I) for i, lab in enumerate(ORDER_LABELS)])
+
+_TRACKING_SCANNER = _FieldScanner([
+    ("ups", UPS_PATTERN, 0),
+    ("fedex", FEDEX_NUMERIC_PATTERN, 0),
+    ("fedex_444", FEDEX_444_PATTERN, 0),
+])
+
+def _weight_from_candidates(cands: _Candidates) -> str:
+    """
+    WEIGHT_PATTERN semantics: first '<n> LB' after the first 'CARTON <dims>'. Like the regex,
+    only if nothing follows the full last dimension, retry with shorter readings of it.
+    """
+    carton = cands.first("carton")
+    if not carton:
+        return ""
+    last_dim = carton.group(1)
+    for k in range(len(last_dim), 0, -1):
+        if not re.fullmatch(LAST_DIM_PATTERN, last_dim[:k]):
+            continue
+        end = carton.start(1) + k
+        for m in cands.all("lbs"):
+            if m.start() >= end:
+                return m.group(1)
+    return ""
+
+# ---------------------- Per-document page text ----------------------
+class _DocText:
+    """
+    Page text extracted once per document and shared by every stage.
+    Keeps raw, UPPERCASE and line-split forms per page index. With `pages` only
+    those pages are read; every other page reads as empty text. `ocr` holds the
+    document's OCR results, for pages whose text layer is not enough (a new one unless given).
+    """
+
+    def __init__(self, doc, pages: Optional[Sequence[int]] = None, ocr: Optional["_DocOcr"] = None):
+        self.pages = range(len(doc)) if pages is None else pages
+        self.raw = [""] * len(doc)
+        for p in self.pages:
+            self.raw[p] = doc[p].get_text()
+        self.upper = [t.upper() for t in self.raw]
+        self.lines = [t.split("\n") for t in self.raw]
+        self.ocr = ocr if ocr is not None else _DocOcr(doc)
+
+    def __len__(self) -> int:
+        return len(self.raw)
+
+    def subset(self, pages: Sequence[int]) -> "_DocText":
+        """Same page strings (not copied), with every page outside `pages` empty."""
+        sub = object.__new__(_DocText)
+        sub.pages = pages
+        keep = set(pages)
+        sub.raw = [t if i in keep else "" for i, t in enumerate(self.raw)]
+        sub.upper = [t if i in keep else "" for i, t in enumerate(self.upper)]
+        sub.lines = [t if i in keep else [""] for i, t in enumerate(self.lines)]
+        sub.ocr = self.ocr
+        return sub
+
+    def full_upper(self) -> str:
+        return "".join(self.upper)
+
+# ---------------------- Page classification (routing) ----------------------
+# tsa:   TSA form page with a text layer  -> TSA text, tables
+# label: carrier label with a text layer  -> tracking (OCR only for embedded images)
+# scan:  image page / almost no text      -> OCR only
+# other: packing lists, cover sheets, ... -> tables when no TSA page exists
+PAGE_TSA, PAGE_LABEL, PAGE_SCAN, PAGE_OTHER = "tsa", "label", "scan", "other"
+_LABEL_KEYWORDS = ("TRACKING", "TRK#", "UPS GROUND", "FEDEX", "SHIP TO")
+_SPARSE_TEXT_CHARS = 40    # fewer non-space characters than this = no usable text layer
+_SCAN_IMAGE_COVER = 0.6    # images covering this much of the page = scanned page
+
+def _is_tsa_page(text_upper: str) -> bool:
+    """
+    TSA page looks like:
+      - 'TRANSFER AND SHIPPING AUTHORIZATION'
+      - and either '1. REFERENCE NO' or '27. BOEING INTERNAL USE'
+    """
+    return "TRANSFER AND SHIPPING AUTHORIZATION" in text_upper and (
+        "REFERENCE NO" in text_upper or "BOEING INTERNAL USE" in text_upper
+    )
+
+def _image_coverage(page) -> float:
+    """Fraction of the page area covered by placed images (0.0 without any image)."""
+    if not page.get_images():
+        return 0.0
+    page_rect = page.rect
+    area = 0.0
+    for info in page.get_image_info():
+        r = fitz.Rect(info["bbox"]) & page_rect
+        if not r.is_empty:
+            area += r.width * r.height
+    return min(1.0, area / max(1.0, page_rect.width * page_rect.height))
+
+def _classify_page(text_upper: str, image_cover: float) -> str:
+    if _is_tsa_page(text_upper):
+        return PAGE_TSA
+    if len("".join(text_upper.split())) < _SPARSE_TEXT_CHARS or image_cover >= _SCAN_IMAGE_COVER:
+        return PAGE_SCAN
+    if any(kw in text_upper for kw in _LABEL_KEYWORDS):
+        return PAGE_LABEL
+    return PAGE_OTHER
+
+class _PageMap:
+    """
+    One cheap classification per page, made right after text extraction, so the
+    expensive paths (OCR, table finding) only visit pages that can pay off.
+    """
+
+    def __init__(self, doc, text: _DocText):
+        self.image_cover = [0.0] * len(text)
+        self.kinds: list[Optional[str]] = [None] * len(text)  # None: page not read
+        self.ocr_tsa: set[int] = set()  # scanned pages whose OCR text turned out to be a TSA
+        for p in text.pages:
+            self.image_cover[p] = _image_coverage(doc[p])
+            self.kinds[p] = _classify_page(text.upper[p], self.image_cover[p])
+
+    def pages(self, *kinds: str) -> list[int]:
+        return [i for i, k in enumerate(self.kinds) if k in kinds]
+
+    def tracking_ocr_pages(self) -> list[int]:
+        """Label and scanned pages, plus any other non-TSA page carrying an image; page order kept."""
+        return [
+            i for i, k in enumerate(self.kinds)
+            if (k in (PAGE_LABEL, PAGE_SCAN) and i not in self.ocr_tsa)
+            or (k == PAGE_OTHER and self.image_cover[i] > 0)
+        ]
+
+    def table_pages(self, tsa_only: bool = False) -> list[int]:
+        """TSA pages hold the order tables; without one, every text page that is not a label."""
+        return self.pages(PAGE_TSA) if tsa_only else self.pages(PAGE_TSA) or self.pages(PAGE_OTHER)
+
+    def counts(self) -> dict:
+        return {k: self.kinds.count(k) for k in (PAGE_TSA, PAGE_LABEL, PAGE_SCAN, PAGE_OTHER)}
 
 # ---------------------- Boeing address block ----------------------
-def _extract_boeing_block_from_page_text(page_text: str) -> str:
-    lines = [ln.strip() for ln in page_text.split("\n")]
+def _extract_boeing_block_from_page_lines(page_lines: list[str]) -> str:
+    lines = [ln.strip() for ln in page_lines]
     for i, raw in enumerate(lines):
         up = raw.strip().upper()
         if up.startswith("THE BOEING CO"):
@@ -90,6 +369,32 @@ def _format_ups_readable(compact: str) -> str:
 def _format_fedex12_readable(d12: str) -> str:
     return f"{d12[0:4]} {d12[4:8]} {d12[8:12]}"
 
+# ---------------------- Carrier check digits ----------------------
+def _ups_check_ok(compact: str) -> bool:
+    """1Z + 15 characters + mod-10 check digit (letters count (ord - 63) % 10, every 2nd value doubled)."""
+    if len(compact) != UPS_CANONICAL_LEN or not compact.startswith("1Z") or not compact[-1].isdigit():
+        return False
+    total = 0
+    for i, ch in enumerate(compact[2:-1]):
+        v = int(ch) if ch.isdigit() else (ord(ch) - 63) % 10
+        total += v * 2 if i % 2 else v
+    return (10 - total % 10) % 10 == int(compact[-1])
+
+def _fedex_check_ok(digits: str) -> bool:
+    """12 digits: weights 1,3,7 from the right, mod 11 (10 -> 0). 15/20 digits: weights 3,1 from the right, mod 10."""
+    if not digits.isdigit() or len(digits) not in (12, 15, 20):
+        return False
+    body, check = digits[:-1], int(digits[-1])
+    if len(digits) == 12:
+        weights = (1, 3, 7)
+        return sum(int(d) * weights[i % 3] for i, d in enumerate(reversed(body))) % 11 % 10 == check
+    total = sum(int(d) * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(body)))
+    return (10 - total % 10) % 10 == check
+
+def _tracking_check_ok(trk: str) -> bool:
+    raw = _u(trk).replace(" ", "")
+    return _ups_check_ok(raw) if raw.startswith("1Z") else _fedex_check_ok(raw)
+
 def _parse_tracking_candidate(s: str) -> Optional[str]:
     """
     Try UPS first, then FedEx. Accept spaces/hyphens/newlines in UPS, normalize and validate.
@@ -98,7 +403,7 @@ def _parse_tracking_candidate(s: str) -> Optional[str]:
 
     # UPS: tolerate whitespace/hyphens after 1Z and up to 50 chars window
     if "1Z" in su:
-        m = re.search(r"1Z[\s0-9A-Z\-]{8,50}", su)
+        m = re.search(UPS_PATTERN, su)
         if m:
             compact = _normalize_ups(m.group(0))
             if compact.startswith("1Z") and len(compact) == UPS_CANONICAL_LEN:
@@ -113,31 +418,182 @@ def _parse_tracking_candidate(s: str) -> Optional[str]:
         return rawn
 
     # Original spaced 4-4-4 pattern
-    m444 = re.search(r"\b(\d{4}\s\d{4}\s\d{4})\b", su)
+    m444 = re.search(FEDEX_444_PATTERN, su)
     if m444:
         return m444.group(1)
 
     return None
 
-def _ocr_page_for_tracking(doc, page_index: int) -> str:
-    """Render page to image, OCR it, and run the same parsing heuristics."""
-    if not _OCR_AVAILABLE:
+def _ocr_pixmap_words(pm, render: str) -> list:
+    """
+    OCR words (pixel boxes) of a rendered pixmap; its samples go to the engine as-is.
+    Identical pixels + settings + engine are served from the on-disk cache.
+    """
+    samples = pm.samples_mv if hasattr(pm, "samples_mv") else pm.samples
+    cache = get_ocr_cache()
+    key = None
+    if cache is not None:
+        key = ocr_cache_key(samples, pm.width, pm.height, f"{render};n={pm.n};words", _ocr_status()[2])
+        hit = cache.get(key)
+        if hit is not None:
+            return [tuple(w) for w in json.loads(hit)]
+    words = get_ocr_engine()[0].recognize_words(samples, pm.width, pm.height, pm.n)
+    if cache is not None:
+        cache.put(key, json.dumps(words))
+    return words
+
+# ---------------------- Region-of-interest OCR ----------------------
+# ITOCHU_OCR_ROI=1: OCR only likely regions at a low zoom first, escalate only when nothing valid is found
+OCR_ROI = os.getenv("ITOCHU_OCR_ROI", "0") == "1"
+OCR_ZOOM_LOW = float(os.getenv("ITOCHU_OCR_ZOOM_LOW", "1.5"))
+OCR_ZOOM_HIGH = 2.0  # full-page default (fitz.Matrix(2, 2))
+
+_ROI_KEYWORDS = ("TRACKING", "TRK", "UPS GROUND", "FEDEX")
+_ROI_MARGIN = 12           # pt above/below a keyword hit
+_ROI_BAND_BELOW = 72       # pt below a keyword where the number usually sits
+_ROI_MIN_IMAGE_AREA = 0.02 # ignore logos/barcode slivers smaller than this share of the page
+# TSA form boxes as page fractions (x0, y0, x1, y1): header rows 1–10, items 26–27 (CLAIM / internal use)
+_TSA_LAYOUT_BOXES = [(0.0, 0.0, 1.0, 0.16), (0.0, 0.40, 1.0, 0.64)]
+
+def _merge_rects(rects: list) -> list:
+    """Union overlapping rects until none overlap, so no area is OCRed twice."""
+    merged = [fitz.Rect(r) for r in rects]
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(merged)):
+            for j in range(i + 1, len(merged)):
+                if merged[i].intersects(merged[j]):
+                    merged[i] |= merged.pop(j)
+                    changed = True
+                    break
+            if changed:
+                break
+    return merged
+
+def _tracking_regions(page) -> list:
+    """Bands around label keywords in the text layer, plus sizeable image blocks (scanned labels)."""
+    pr = page.rect
+    rects = []
+    for kw in _ROI_KEYWORDS:
+        for hit in page.search_for(kw):
+            rects.append(fitz.Rect(pr.x0, hit.y0 - _ROI_MARGIN, pr.x1, hit.y1 + _ROI_BAND_BELOW) & pr)
+    for info in page.get_image_info():
+        r = fitz.Rect(info["bbox"]) & pr
+        if r.get_area() >= _ROI_MIN_IMAGE_AREA * pr.get_area():
+            rects.append(r)
+    return _merge_rects([r for r in rects if not r.is_empty])
+
+def _tsa_regions(page) -> list:
+    pr = page.rect
+    return [fitz.Rect(pr.x0 + x0 * pr.width, pr.y0 + y0 * pr.height, pr.x0 + x1 * pr.width, pr.y0 + y1 * pr.height)
+            for x0, y0, x1, y1 in _TSA_LAYOUT_BOXES]
+
+def _ocr_plan(page, regions: list) -> list[tuple[list, float]]:
+    """
+    (clips, zoom) attempts in order: regions at low zoom, regions at high zoom, then the
+    whole page at high zoom when the regions don't already cover it. clip None = full page.
+    """
+    full = [([None], OCR_ZOOM_HIGH)]
+    if not OCR_ROI or not regions:
+        return full
+    plan = [(regions, OCR_ZOOM_LOW), (regions, OCR_ZOOM_HIGH)]
+    covered = sum(r.get_area() for r in regions)
+    if covered < 0.95 * page.rect.get_area():
+        plan += [([None], OCR_ZOOM_HIGH)]
+    return plan
+
+# ---------------------- Per-document OCR (one grayscale render + pass per page/region) ----------------------
+class _DocOcr:
+    """
+    OCR results of one open document, shared by the tracking and TSA lookups. Pages are
+    rendered in grayscale and OCRed at most once per (page, clip, zoom); once a page has had
+    a full-page pass, its word boxes answer every region query on it without another render.
+    """
+
+    def __init__(self, doc):
+        self._doc = doc
+        self._pages: dict[int, list] = {}     # page -> words in page coordinates (full-page pass)
+        self._clips: dict[tuple, str] = {}    # (page, clip, zoom) -> text
+
+    def page_words(self, page_index: int) -> Optional[list]:
+        """Word boxes of the page's full-page pass, None if it has not had one."""
+        return self._pages.get(page_index)
+
+    def add_page(self, page_index: int, words: list) -> None:
+        """Keep a full-page pass made elsewhere (an OCR worker process)."""
+        self._pages[page_index] = words
+
+    def _render_words(self, page_index: int, clip, zoom: float) -> list:
+        page = self._doc[page_index]
+        pm = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, colorspace=fitz.csGRAY, alpha=False)
+        tag = f"gray;zoom={zoom}" if clip is None else f"gray;zoom={zoom};clip={tuple(round(v, 1) for v in clip)}"
+        x0, y0 = (clip.x0, clip.y0) if clip is not None else (page.rect.x0, page.rect.y0)
+        return [(x0 + a / zoom, y0 + b / zoom, x0 + c / zoom, y0 + d / zoom, line, t)
+                for a, b, c, d, line, t in _ocr_pixmap_words(pm, tag)]
+
+    def text(self, page_index: int, clip=None, zoom: float = OCR_ZOOM_HIGH) -> str:
+        """OCR text of a page, or of the words centred inside `clip` (page coordinates)."""
+        words = self._pages.get(page_index)
+        if words is None and clip is None:
+            words = self._pages[page_index] = self._render_words(page_index, None, OCR_ZOOM_HIGH)
+        if words is not None:
+            if clip is not None:
+                words = [w for w in words if fitz.Point((w[0] + w[2]) / 2, (w[1] + w[3]) / 2) in clip]
+            return words_to_text(words)
+        key = (page_index, tuple(round(v, 1) for v in clip), zoom)
+        if key not in self._clips:
+            self._clips[key] = words_to_text(self._render_words(page_index, clip, zoom))
+        return self._clips[key]
+
+def _ocr_page_for_tracking(doc, page_index: int, ocr: Optional[_DocOcr] = None) -> str:
+    """
+    Render page (or its label regions, see _ocr_plan) to image, OCR it, and run the same parsing
+    heuristics. A hit that fails its check digit doesn't end the plan: later (higher zoom)
+    attempts may still read it cleanly, and it is returned only if none validates.
+    """
+    if not _ocr_available():
         return ""
+    ocr = ocr or _DocOcr(doc)
+    weak = ""
     try:
         page = doc[page_index]
-        # Render at higher DPI for better OCR (zoom x2)
-        mat = fitz.Matrix(2, 2)
-        pm = page.get_pixmap(matrix=mat, alpha=False)
-        img = Image.open(io.BytesIO(pm.tobytes("png")))
-        text = pytesseract.image_to_string(img)
+        for clips, zoom in _ocr_plan(page, _tracking_regions(page) if OCR_ROI else []):
+            for clip in clips:
+                trk = _tracking_from_ocr_text(ocr.text(page_index, clip, zoom))
+                if trk and _tracking_check_ok(trk):
+                    return trk
+                weak = weak or trk
     except Exception as e:
         print(f"[extractor] OCR failed on page {page_index+1}: {e}")
-        return ""
+    return weak
 
+def _tracking_anywhere_candidates(su: str):
+    """Tracking-number shapes anywhere in UPPERCASE text: UPS 1Z (spaces/hyphens tolerated), FedEx 12/15/20, spaced 4-4-4."""
+    cands = _TRACKING_SCANNER.scan(su)
+    for m in cands.non_overlapping("ups"):
+        compact = _normalize_ups(m.group(0))
+        if compact.startswith("1Z") and len(compact) == UPS_CANONICAL_LEN:
+            yield _format_ups_readable(compact)
+    for m in cands.all("fedex"):
+        rawn = m.group(1)
+        yield _format_fedex12_readable(rawn) if len(rawn) == 12 else rawn
+    for m in cands.all("fedex_444"):
+        yield m.group(1)
+
+def _best_tracking(label: list[str], anywhere: list[str]) -> tuple[str, bool]:
+    """(value, check digit ok): a valid label hit, a valid hit anywhere, else the first label hit."""
+    for trk in label + anywhere:
+        if _tracking_check_ok(trk):
+            return trk, True
+    return (label[0], False) if label else ("", False)
+
+def _tracking_from_ocr_text(text: str) -> str:
     lines = [ln.rstrip() for ln in text.split("\n") if ln.strip()]
 
     # Label-driven search first
     label_regex = re.compile(r"(UPS\s+GROUND|TRACKING\s*#?|TRK#)", re.IGNORECASE)
+    label = []
     for i, line in enumerate(lines):
         if not label_regex.search(line):
             continue
@@ -148,52 +604,141 @@ def _ocr_page_for_tracking(doc, page_index: int) -> str:
             candidate = same_line[1].strip()
             trk = _parse_tracking_candidate(candidate)
             if trk:
-                return trk
+                label.append(trk)
+                continue
 
         # next 2 lines
         for j in range(i + 1, min(i + 4, len(lines))):
             nxt = lines[j].strip()
             trk = _parse_tracking_candidate(nxt)
-            if trk:
-                return trk
-            if j + 1 < len(lines):
+            if not trk and j + 1 < len(lines):
                 nxt2 = (nxt + " " + lines[j + 1].strip()).strip()
                 trk = _parse_tracking_candidate(nxt2)
-                if trk:
-                    return trk
-
-    # Anywhere on the OCR page
-    page_text_u = _u(" ".join(lines))
-    for m in re.finditer(r"1Z[\s0-9A-Z\-]{8,50}", page_text_u):
-        compact = _normalize_ups(m.group(0))
-        if compact.startswith("1Z") and len(compact) == UPS_CANONICAL_LEN:
-            return _format_ups_readable(compact)
-
-    mfx = re.search(FEDEX_NUMERIC_PATTERN, page_text_u)
-    if mfx:
-        rawn = mfx.group(1)
-        if len(rawn) == 12:
-            return _format_fedex12_readable(rawn)
-        return rawn
-
-    m444 = re.search(r"\b(\d{4}\s\d{4}\s\d{4})\b", page_text_u)
-    if m444:
-        return m444.group(1)
-
-    return ""
-
-def _extract_tracking_from_doc(doc) -> str:
+            if trk:
+                label.append(trk)
+                break
+
+    # Anywhere on the OCR page; a check-digit-valid number beats an unverified label hit
+    anywhere = list(_tracking_anywhere_candidates(_u(" ".join(lines))))
+    trk, ok = _best_tracking(label, anywhere)
+    if trk:
+        return trk
+    # nothing validated and no label: only a UPS 1Z shape is distinctive enough to keep unverified;
+    # a bare 12/15/20-digit run off a label is as likely a phone, PO or part number
+    return next((t for t in anywhere if t.startswith("1Z")), "")
+
+# ---------------------- Parallel OCR (process pool) ----------------------
+# 0/1 = OCR pages serially in this process; N > 1 = render + OCR pages across N worker processes
+OCR_WORKERS = int(os.getenv("ITOCHU_OCR_WORKERS", "0") or 0)
+
+_ocr_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_ocr_pool() -> ProcessPoolExecutor:
+    global _ocr_pool
+    if _ocr_pool is None:
+        # spawn: this may run inside the threaded watcher (ITOCHU_EXTRACT_WORKERS=1), where a
+        # forked worker can inherit a lock another thread holds and hang
+        _ocr_pool = ProcessPoolExecutor(max_workers=OCR_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _ocr_pool
+
+def _use_parallel_ocr(doc, n_pages: int) -> bool:
+    # workers reopen the file by path, so in-memory docs stay serial
+    return OCR_WORKERS > 1 and n_pages > 1 and bool(getattr(doc, "name", ""))
+
+def _ocr_tracking_worker(pdf_path: str, page_index: int) -> str:
+    """Pool entrypoint: a fitz doc can't be pickled, so each task reopens the file."""
+    with fitz.open(pdf_path) as doc:
+        return _ocr_page_for_tracking(doc, page_index)
+
+def _ocr_textonly_worker(pdf_path: str, page_index: int) -> str:
+    with fitz.open(pdf_path) as doc:
+        return _ocr_text_for_page_textonly(doc, page_index)
+
+def _ocr_scanned_worker(pdf_path: str, page_index: int) -> tuple[str, Optional[list]]:
+    """(text, full-page words or None) so the caller's _DocOcr can keep the pass."""
+    with fitz.open(pdf_path) as doc:
+        ocr = _DocOcr(doc)
+        return _ocr_text_for_scanned_page(doc, page_index, ocr), ocr.page_words(page_index)
+
+def _ocr_pages_for_tracking_parallel(doc, pages: list[int], stats: _ExtractStats,
+                                     ocr: Optional[_DocOcr] = None) -> str:
     """
-    A) TEXT path on any page: 'TRACKING', 'TRACKING #', or 'TRK#' (same line or next line or split).
-    B) Whole-doc TEXT fallback: UPS 1Z (with spaces/hyphens) or FedEx numeric (12/15/20).
-    C) OCR fallback: page images (p1–2 first, then others).
+    OCR `pages` concurrently, submitted in priority order (p1–2 first). Pages that already
+    had a full-page pass in `ocr` are answered here from its words instead.
+    Results are reduced in page order with the serial walk's rule (_pick_ocr_tracking), so the
+    answer is the serial one. Pages that can no longer matter are cancelled: everything after
+    a valid hit, and everything past TRACKING_OCR_VERIFY_PAGES after an unverified one.
     """
+    pool = _get_ocr_pool()
+    futures = []
+    for p in pages:
+        if ocr is not None and ocr.page_words(p) is not None:
+            fut = Future()
+            fut.set_result(_ocr_page_for_tracking(doc, p, ocr))
+        else:
+            fut = pool.submit(_ocr_tracking_worker, doc.name, p)
+        futures.append(fut)
+    results: dict[int, str] = {}
+    picked = None
+    try:
+        for fut in as_completed(futures):
+            if fut.cancelled():
+                continue
+            i = futures.index(fut)
+            try:
+                trk = fut.result()
+            except Exception as e:
+                print(f"[extractor] OCR worker failed on page {pages[i]+1}: {e}")
+                trk = ""
+            results[i] = trk
+            if trk:
+                keep = 0 if _tracking_check_ok(trk) else TRACKING_OCR_VERIFY_PAGES
+                for later in futures[i + 1 + keep:]:
+                    later.cancel()
+            picked = _pick_ocr_tracking(results, len(futures))
+            if picked is not None:
+                break
+    finally:
+        for fut in futures:
+            fut.cancel()
+        stats.count("ocr_pages", sum(1 for f in futures if not f.cancelled()))
+    return picked or ""
+
+def _ocr_pages_textonly_parallel(pdf_path: str, pages: list[int], stats: _ExtractStats) -> list[str]:
+    pool = _get_ocr_pool()
+    futures = [pool.submit(_ocr_textonly_worker, pdf_path, p) for p in pages]
+    out = []
+    for pi, fut in zip(pages, futures):
+        try:
+            out.append(fut.result())
+        except Exception as e:
+            print(f"[extractor] OCR(text) worker failed on page {pi+1}: {e}")
+            out.append("")
+    stats.count("ocr_pages", len(pages))
+    return out
+
+def _ocr_scanned_pages_parallel(pdf_path: str, pages: list[int], stats: _ExtractStats, ocr: _DocOcr) -> list[str]:
+    """Like _ocr_pages_textonly_parallel for scanned pages; full-page passes are kept in `ocr`."""
+    pool = _get_ocr_pool()
+    futures = [pool.submit(_ocr_scanned_worker, pdf_path, p) for p in pages]
+    out = []
+    for pi, fut in zip(pages, futures):
+        try:
+            text, words = fut.result()
+        except Exception as e:
+            print(f"[extractor] OCR(text) worker failed on page {pi+1}: {e}")
+            text, words = "", None
+        if words is not None:
+            ocr.add_page(pi, words)
+        out.append(text)
+    stats.count("ocr_pages", len(pages))
+    return out
+
+def _tracking_label_candidates(text: _DocText):
+    """A) label-driven: 'TRACKING', 'TRACKING #' or 'TRK#' (same line, next line, or split over two)."""
     label_regex = re.compile(r"(TRACKING\s*#?|TRK#)", re.IGNORECASE)
-
-    # ----- A: label-driven, text-based -----
-    for p in range(len(doc)):
-        raw = doc[p].get_text()
-        lines = [ln.rstrip() for ln in raw.split("\n")]
+    for p in range(len(text)):
+        lines = text.lines[p]
 
         for i, line in enumerate(lines):
             if not label_regex.search(line):
@@ -205,7 +750,8 @@ def _extract_tracking_from_doc(doc) -> str:
                 candidate = same_line[1].strip()
                 trk = _parse_tracking_candidate(candidate)
                 if trk:
-                    return trk
+                    yield trk
+                    continue
 
             # next non-empty lines
             for j in range(i + 1, min(i + 4, len(lines))):
@@ -213,55 +759,100 @@ def _extract_tracking_from_doc(doc) -> str:
                 if not nxt:
                     continue
                 trk = _parse_tracking_candidate(nxt)
-                if trk:
-                    return trk
                 # Sometimes the value is broken across two lines:
-                if j + 1 < len(lines):
+                if not trk and j + 1 < len(lines):
                     nxt2 = (nxt + " " + lines[j + 1].strip()).strip()
                     trk = _parse_tracking_candidate(nxt2)
-                    if trk:
-                        return trk
-
-    # ----- B: anywhere in TEXT -----
-    all_text = " ".join(doc[p].get_text() for p in range(len(doc)))
-    all_text_u = _u(re.sub(r"\s+", " ", all_text))
+                if trk:
+                    yield trk
+                    break
 
-    # UPS anywhere (spaces/hyphens tolerated)
-    for m in re.finditer(r"1Z[\s0-9A-Z\-]{8,50}", all_text_u):
-        compact = _normalize_ups(m.group(0))
-        if compact.startswith("1Z") and len(compact) == UPS_CANONICAL_LEN:
-            return _format_ups_readable(compact)
+# After an OCR hit that fails its check digit, OCR at most this many further pages looking for one that passes
+TRACKING_OCR_VERIFY_PAGES = int(os.getenv("ITOCHU_TRACKING_OCR_VERIFY_PAGES", "2"))
 
-    # FedEx numeric anywhere (12/15/20)
-    mfx2 = re.search(FEDEX_NUMERIC_PATTERN, all_text_u)
-    if mfx2:
-        rawn = mfx2.group(1)
-        if len(rawn) == 12:
-            return _format_fedex12_readable(rawn)
-        return rawn
-
-    # Spaced 4-4-4 anywhere
-    m444 = re.search(r"\b(\d{4}\s\d{4}\s\d{4})\b", all_text_u)
-    if m444:
-        return m444.group(1)
+def _pick_ocr_tracking(results: dict[int, str], n: int) -> Optional[str]:
+    """
+    The OCR walk's stop rule over `results` {position in the page list: hit or ""} of `n` pages:
+    the first check-digit-valid hit, else the first unverified one once the
+    TRACKING_OCR_VERIFY_PAGES pages after it are in. None while an earlier page is still missing.
+    """
+    fallback, limit = "", n
+    for k in range(n):
+        if k >= limit:
+            break
+        if k not in results:
+            return None
+        trk = results[k]
+        if not trk:
+            continue
+        if _tracking_check_ok(trk):
+            return trk
+        if not fallback:
+            fallback, limit = trk, min(limit, k + 1 + TRACKING_OCR_VERIFY_PAGES)
+    return fallback
 
-    # ----- C: OCR fallbacks -----
-    if not _OCR_AVAILABLE:
-        print(f"[extractor] OCR unavailable ({_OCR_REASON}). Install Tesseract + pytesseract + pillow for UPS label images.")
+def _tracking_from_ocr(doc, stats: _ExtractStats, pages: Optional[list[int]] = None,
+                       ocr: Optional[_DocOcr] = None) -> str:
+    """
+    C) OCR fallback: page images (p1–2 first, then others) of `pages` (default: all pages).
+    The first check-digit-valid hit wins; otherwise the earliest unverified one.
+    """
+    if not _ocr_available():
+        print(f"[extractor] OCR unavailable ({_ocr_status()[1]}). Install Tesseract + tesserocr (or pytesseract + pillow) for UPS label images.")
         return ""
 
-    # OCR first 1–2 pages (labels are typically early)
-    for p in range(min(2, len(doc))):
-        trk = _ocr_page_for_tracking(doc, p)
-        if trk:
-            return trk
+    # Page order already encodes the priority: p1–2 first, then the rest
+    if pages is None:
+        pages = list(range(len(doc)))
+    if _use_parallel_ocr(doc, len(pages)):
+        return _ocr_pages_for_tracking_parallel(doc, pages, stats, ocr)
+
+    # OCR first 1–2 pages (labels are typically early), then the rest
+    ocr = ocr or _DocOcr(doc)
+    results: dict[int, str] = {}
+    for k, p in enumerate(pages):
+        stats.count("ocr_pages")
+        results[k] = _ocr_page_for_tracking(doc, p, ocr)
+        picked = _pick_ocr_tracking(results, len(pages))
+        if picked is not None:
+            return picked
+    return ""
+
+def _extract_tracking_from_doc(doc, text: _DocText, stats: Optional[_ExtractStats] = None,
+                               pagemap: Optional[_PageMap] = None, ocr: bool = True) -> str:
+    """
+    Ranked candidates, first check-digit-valid one wins: A (text labels) → B (text anywhere)
+    → C (OCR, only when no text candidate validates). Without a valid one: an unverified label
+    hit, then OCR's, then an unverified UPS number; FedEx-shaped numbers found outside a label
+    (phone numbers, NSNs, ...) must validate. Records the winning tier in `stats`.
+    With a page map, OCR skips TSA and text-only pages; `ocr=False` stops after the text tiers.
+    """
+    stats = stats or _ExtractStats()
+    label = list(_tracking_label_candidates(text))
+    anywhere = list(_tracking_anywhere_candidates(re.sub(r"\s+", " ", " ".join(text.upper))))
+    for tier, cands in (("text_label", label), ("text_anywhere", anywhere)):
+        for trk in cands:
+            if _tracking_check_ok(trk):
+                stats.tiers["tracking_number"] = tier
+                return trk
 
-    # If still nothing, OCR the rest
-    for p in range(2, len(doc)):
-        trk = _ocr_page_for_tracking(doc, p)
+    ocr_trk = ""
+    if ocr:
+        ocr_pages = pagemap.tracking_ocr_pages() if pagemap is not None else None
+        ocr_trk = _tracking_from_ocr(doc, stats, ocr_pages, text.ocr)
+        if ocr_trk and _tracking_check_ok(ocr_trk):
+            stats.tiers["tracking_number"] = "ocr"
+            return ocr_trk
+
+    unverified = [
+        ("text_label", label[0] if label else ""),
+        ("ocr", ocr_trk),
+        ("text_anywhere", next((t for t in anywhere if t.startswith("1Z")), "")),
+    ]
+    for tier, trk in unverified:
         if trk:
+            stats.tiers["tracking_number"] = tier
             return trk
-
     return ""
 
 def _infer_carrier(trk: str) -> str:
@@ -274,10 +865,36 @@ def _infer_carrier(trk: str) -> str:
         return "FEDEX"
     return "UNDEFINED"
 
-# ---------------------- ORDER helpers (tables/text/filename) ----------------------
-def _table_rows_upper(pdf_path: str):
+# ---------------------- Table rows (parsed once per document) ----------------------
+# auto: PyMuPDF's in-process table finder, tabula (JVM) only if that is unavailable
+# pymupdf / tabula: force one backend
+TABLE_BACKEND = os.getenv("ITOCHU_TABLE_BACKEND", "auto").lower()
+
+def _table_row_text(cells) -> str:
+    parts = [" ".join(str(c).split()) for c in cells if c is not None]
+    return " ".join(p for p in parts if p).upper()
+
+def _table_rows_pymupdf(doc, pages: Optional[list[int]] = None) -> Optional[list[str]]:
+    """Rows from fitz's table finder on the open doc (all pages or `pages`); None if the finder is unavailable or fails."""
+    if doc is None or not hasattr(fitz.Page, "find_tables"):
+        return None
+    rows = []
     try:
-        tables = tabula.read_pdf(pdf_path, pages="all", multiple_tables=True, lattice=True)
+        for pi in (range(len(doc)) if pages is None else pages):
+            for table in doc[pi].find_tables().tables:
+                for row in table.extract():
+                    txt = _table_row_text(row)
+                    if txt:
+                        rows.append(txt)
+    except Exception as e:
+        print(f"PyMuPDF table extraction failed: {e}")
+        return None
+    return rows
+
+def _table_rows_tabula(pdf_path: str, pages: Optional[list[int]] = None) -> list[str]:
+    tabula_pages = "all" if pages is None else [pi + 1 for pi in pages]
+    try:
+        tables = tabula.read_pdf(pdf_path, pages=tabula_pages, multiple_tables=True, lattice=True)
     except Exception as e:
         print(f"Tabula PDF table extraction failed: {e}")
         return []
@@ -291,8 +908,43 @@ def _table_rows_upper(pdf_path: str):
             continue
     return rows
 
-def _order_from_tables_by_pattern(pdf_path: str, pattern: str, label_hint: str | None = None) -> str:
-    rows = _table_rows_upper(pdf_path)
+class _DocTables:
+    """
+    UPPERCASE table rows for one document. Parsed on first use and memoized, so every
+    order-number fallback shares a single parse (and at most one tabula/JVM launch).
+    With a page map only the table-bearing pages are parsed.
+    """
+
+    def __init__(self, doc, pdf_path: str, stats: Optional[_ExtractStats] = None,
+                 pagemap: Optional[_PageMap] = None, tsa_only: bool = False):
+        self._doc = doc
+        self._pdf_path = pdf_path
+        self._stats = stats or _ExtractStats()
+        self._pages = pagemap.table_pages(tsa_only) if pagemap is not None else None
+        self._rows: Optional[list[str]] = None
+
+    @property
+    def parsed(self) -> bool:
+        return self._rows is not None or self._pages == []
+
+    def rows(self) -> list[str]:
+        if self._rows is None and self._pages == []:
+            self._rows = []
+        if self._rows is None:
+            with self._stats.stage("tables"):
+                self._stats.count("table_parses")
+                rows = None
+                if TABLE_BACKEND in ("auto", "pymupdf"):
+                    rows = _table_rows_pymupdf(self._doc, self._pages)
+                if rows is None and TABLE_BACKEND in ("auto", "tabula"):
+                    self._stats.count("tabula_calls")
+                    rows = _table_rows_tabula(self._pdf_path, self._pages)
+                self._rows = rows or []
+        return self._rows
+
+# ---------------------- ORDER helpers (tables/text/filename) ----------------------
+def _order_from_tables_by_pattern(tables: _DocTables, pattern: str, label_hint: str | None = None) -> str:
+    rows = tables.rows()
     if label_hint:
         for txt in rows:
             if label_hint.upper() in txt:
@@ -305,14 +957,13 @@ def _order_from_tables_by_pattern(pdf_path: str, pattern: str, label_hint: str |
             return m.group(0)
     return ""
 
-def _order_from_text_by_pattern(full_text_upper: str, pattern: str, label_hint: str | None = None, window_after: int = 250) -> str:
-    if label_hint:
-        for m in _finditer_ignorecase(full_text_upper, label_hint):
-            window = full_text_upper[m.end(): m.end() + window_after]
-            m2 = re.search(pattern, window, flags=re.IGNORECASE)
+def _order_from_text_candidates(cands: _Candidates, kind: str, hint_kind: str | None = None, window_after: int = 250) -> str:
+    if hint_kind:
+        for m in cands.all(hint_kind):
+            m2 = cands.first_within(kind, m.end(), m.end() + window_after)
             if m2:
                 return m2.group(0)
-    m3 = re.search(pattern, full_text_upper, flags=re.IGNORECASE)
+    m3 = cands.first(kind)
     if m3:
         return m3.group(0)
     return ""
@@ -322,16 +973,17 @@ def _order_from_filename_by_pattern(pdf_path: str, pattern: str) -> str:
     m = re.search(pattern, fname, flags=re.IGNORECASE)
     return m.group(0) if m else ""
 
-def _any_orderish_from_tables_or_text(pdf_path: str, full_text_upper: str) -> str:
-    rows = _table_rows_upper(pdf_path)
+def _any_orderish_from_tables_or_text(tables: _DocTables, cands: _Candidates) -> str:
+    rows = tables.rows()
     for txt in rows:
         for lab in ORDER_LABELS:
             if re.search(lab, txt, flags=re.IGNORECASE):
                 m = re.search(ORDERISH_TOKEN, txt)
                 if m:
                     return m.group(1)
-    for lab in ORDER_LABELS:
-        for mm in re.finditer(lab, full_text_upper, flags=re.IGNORECASE):
+    full_text_upper = cands.text
+    for i in range(len(ORDER_LABELS)):
+        for mm in cands.all(f"order_label_{i}"):
             window = full_text_upper[mm.end(): mm.end() + 200]
             m = re.search(ORDERISH_TOKEN, window)
             if m:
@@ -342,33 +994,46 @@ def _any_orderish_from_tables_or_text(pdf_path: str, full_text_upper: str) -> st
     return ""
 
 # ---------------------- TSA page helpers (scoped extraction) ----------------------
-def _tsa_candidate_pages(doc) -> list[int]:
-    """
-    TSA page looks like:
-      - 'TRANSFER AND SHIPPING AUTHORIZATION'
-      - and either '1. REFERENCE NO' or '27. BOEING INTERNAL USE'
-    """
-    pages = []
-    for i in range(len(doc)):
-        t = doc[i].get_text().upper()
-        if "TRANSFER AND SHIPPING AUTHORIZATION" in t and (
-            "REFERENCE NO" in t or "BOEING INTERNAL USE" in t
-        ):
-            pages.append(i)
-    return pages
-
-def _ocr_text_for_page_textonly(doc, page_index: int) -> str:
-    """OCR a page for general text (2x DPI)."""
-    if not _OCR_AVAILABLE:
+def _tsa_candidate_pages(text: _DocText, pagemap: Optional[_PageMap] = None) -> list[int]:
+    if pagemap is not None:
+        return pagemap.pages(PAGE_TSA)
+    return [i for i, t in enumerate(text.upper) if _is_tsa_page(t)]
+
+def _tsa_ocr_text_ok(text_upper: str) -> bool:
+    """Region OCR is good enough once it yields both a reference and an order candidate (PHBBT or PHCDT)."""
+    cands = _TEXT_SCANNER.scan(_normalize_ocr_noise(text_upper))
+    has_ref = cands.first("ref") or cands.first("ref_noisy")
+    has_order = cands.first("tsa_claim") or cands.first("tsa_507") or cands.first("phcdt_order")
+    return bool(has_ref and has_order)
+
+def _ocr_text_for_page_textonly(doc, page_index: int, ocr: Optional[_DocOcr] = None) -> str:
+    """OCR a page for general text (2x DPI; TSA layout boxes first in ROI mode)."""
+    if not _ocr_available():
         return ""
+    ocr = ocr or _DocOcr(doc)
     try:
-        mat = fitz.Matrix(2, 2)
-        pm = doc[page_index].get_pixmap(matrix=mat, alpha=False)
-        img = Image.open(io.BytesIO(pm.tobytes("png")))
-        return pytesseract.image_to_string(img).upper()
+        page = doc[page_index]
+        plan = _ocr_plan(page, _tsa_regions(page) if OCR_ROI else [])
+        for n, (clips, zoom) in enumerate(plan):
+            text = "\n".join(ocr.text(page_index, clip, zoom) for clip in clips).upper()
+            if n == len(plan) - 1 or _tsa_ocr_text_ok(text):
+                return text
     except Exception as e:
         print(f"[extractor] OCR(text) failed on page {page_index+1}: {e}")
-        return ""
+    return ""
+
+def _ocr_text_for_scanned_page(doc, page_index: int, ocr: _DocOcr) -> str:
+    """
+    OCR a scanned page that may be a TSA. In ROI mode the TSA layout boxes are read at low zoom
+    first and suffice if they show a whole TSA; any other page gets the full-page pass, which
+    the tracking OCR reuses without another render.
+    """
+    if OCR_ROI:
+        page = doc[page_index]
+        text = "\n".join(ocr.text(page_index, clip, OCR_ZOOM_LOW) for clip in _tsa_regions(page)).upper()
+        if _is_tsa_page(_normalize_ocr_noise(text)) and _tsa_ocr_text_ok(text):
+            return text
+    return ocr.text(page_index).upper()
 
 def _normalize_ocr_noise(s: str) -> str:
     """
@@ -386,25 +1051,42 @@ def _normalize_ocr_noise(s: str) -> str:
     s = re.sub(r"[^\n\rA-Z0-9\-\s:./]", "", s)
     return s
 
-def _collect_tsa_text(doc) -> tuple[str, list[int]]:
+def _collect_tsa_text(doc, text: _DocText, stats: Optional[_ExtractStats] = None,
+                      pagemap: Optional[_PageMap] = None) -> tuple[str, list[int]]:
     """
     Concatenate TEXT from all TSA pages; if text is sparse, append OCR.
     Return (UPPERCASE normalized text, page_indexes).
     """
-    pages = _tsa_candidate_pages(doc)
-    tsa_text = ""
-    for pi in pages:
-        tsa_text += doc[pi].get_text().upper() + "\n"
+    pages = _tsa_candidate_pages(text, pagemap)
+    tsa_text = "".join(text.upper[pi] + "\n" for pi in pages)
+    if not pages and pagemap is not None and pagemap.pages(PAGE_SCAN) and _ocr_available():
+        # No TSA in the text layer: look for a scanned one. The page's OCR pass is kept in
+        # text.ocr and answers the tracking OCR later without another render.
+        scans = pagemap.pages(PAGE_SCAN)
+        stats = stats or _ExtractStats()
+        if _use_parallel_ocr(doc, len(scans)):
+            ocr_texts = _ocr_scanned_pages_parallel(doc.name, scans, stats, text.ocr)
+        else:
+            stats.count("ocr_pages", len(scans))
+            ocr_texts = [_ocr_text_for_scanned_page(doc, pi, text.ocr) for pi in scans]
+        found = [(pi, t) for pi, t in zip(scans, ocr_texts) if _is_tsa_page(_normalize_ocr_noise(t))]
+        return _normalize_ocr_noise("".join(t + "\n" for _, t in found)), [pi for pi, _ in found]
     if pages and len(tsa_text.strip()) < 100:  # scanned/low-text fallback
-        for pi in pages:
-            tsa_text += _ocr_text_for_page_textonly(doc, pi) + "\n"
+        stats = stats or _ExtractStats()
+        if _use_parallel_ocr(doc, len(pages)):
+            ocr_texts = _ocr_pages_textonly_parallel(doc.name, pages, stats)
+        else:
+            stats.count("ocr_pages", len(pages))
+            ocr_texts = [_ocr_text_for_page_textonly(doc, pi, text.ocr) for pi in pages]
+        for t in ocr_texts:
+            tsa_text += t + "\n"
     return _normalize_ocr_noise(tsa_text), pages
 
-def _extract_ref_from_tsa_text(tsa_text_upper: str) -> str:
+def _extract_ref_from_tsa_text(tsa_cands: _Candidates) -> str:
     """
     Prefer PHBBT if present; otherwise accept PHCDT; noisy '...HBBT-#######' → PHBBT-#######.
     """
-    strict = [m.group(0) for m in re.finditer(PH_REF_PATTERN, tsa_text_upper)]
+    strict = [m.group(0) for m in tsa_cands.non_overlapping("ref")]
     if strict:
         for tok in strict:
             if tok.upper().startswith("PHBBT"):
@@ -412,12 +1094,12 @@ def _extract_ref_from_tsa_text(tsa_text_upper: str) -> str:
         return strict[0].replace(" ", "").upper()
 
     # noisy '??HBBT-1234567' → PHBBT-1234567
-    m = re.search(r"[A-Z\?\./]{0,3}HBBT[-\s]?(\d{6,9})", tsa_text_upper)
+    m = tsa_cands.first("ref_noisy")
     if m:
         return f"PHBBT-{m.group(1)}"
     return ""
 
-def _order_from_tsa_text(tsa_text_upper: str) -> str:
+def _order_from_tsa_text(tsa_cands: _Candidates) -> str:
     """
     Look only in TSA text (which includes the 26→27 window) for:
       - preferred '507xxx-8Hxxxx'
@@ -426,7 +1108,7 @@ def _order_from_tsa_text(tsa_text_upper: str) -> str:
       - final generic 6+6 fallback
     """
     # Try around 'CLAIM:' first (appears near 26 → 27)
-    m = re.search(r"CLAIM[:\s]+([56]07[A-Z0-9]{3})[-\s]?((?:8H)[A-Z0-9]{4})", tsa_text_upper)
+    m = tsa_cands.first("tsa_claim")
     if m:
         left = m.group(1)
         if left.startswith("607"):
@@ -437,7 +1119,7 @@ def _order_from_tsa_text(tsa_text_upper: str) -> str:
         return f"{left}-{right}"
 
     # Preferred exact pattern
-    m2 = re.search(r"\b(507[A-Z0-9]{3})[-\s]?((?:8H)[A-Z0-9]{4})\b", tsa_text_upper)
+    m2 = tsa_cands.first("tsa_507")
     if m2:
         left, right = m2.group(1), m2.group(2)
         if right.endswith("L"):
@@ -445,133 +1127,207 @@ def _order_from_tsa_text(tsa_text_upper: str) -> str:
         return f"{left}-{right}"
 
     # Generic 6 + 6 as last resort (kept within TSA text scope)
-    m3 = re.search(r"\b([0-9]{6})[-\s]?([A-Z0-9]{6})\b", tsa_text_upper)
+    m3 = tsa_cands.first("tsa_six_six")
     if m3:
         return f"{m3.group(1)}-{m3.group(2)}"
     return ""
 
 # ---------------------- ORDER dispatcher by doc type ----------------------
-def _extract_order_no(pdf_path: str, full_text_upper: str, doc_type: str | None) -> str:
+# Estimated cost (ms) per strategy until enough runs are timed. Table strategies (and
+# any_orderish, which reads tables first) pay for the document's one table parse; once
+# it has happened they cost about as much as a text lookup.
+ORDER_STRATEGY_COST_MS = {
+    "tables_label": 40.0, "tables": 40.0, "tables_8h": 40.0, "tables_legacy6": 40.0, "any_orderish": 40.0,
+    "text_label": 0.2, "text": 0.1, "text_8h": 0.1, "text_legacy6": 0.2, "tsa_window": 0.1,
+    "filename": 0.05, "filename_legacy6": 0.05,
+}
+_ORDER_TABLE_STRATEGIES = ("tables_label", "tables", "tables_8h", "tables_legacy6", "any_orderish")
+ORDER_CHEAP_MS = 1.0  # strategies below this always run; costlier ones may be skipped
+
+def _order_strategy_cost(name: str, tables: _DocTables, doc_type: str) -> float:
+    if name in _ORDER_TABLE_STRATEGIES and tables.parsed:
+        return ORDER_STRATEGY_COST_MS["text"]
+    learned = get_order_stats().avg_ms(doc_type, name)
+    return learned if learned is not None else ORDER_STRATEGY_COST_MS.get(name, ORDER_CHEAP_MS)
+
+def _order_tiers(pdf_path: str, tables: _DocTables, cands: _Candidates, doc_type: str | None) -> list:
+    """(tier name, lookup) in precedence order for the doc type."""
     if doc_type == "PHBBT":
-        label_hint = "10 CHARGE LINE"
-        v = _order_from_tables_by_pattern(pdf_path, PHBBT_ORDER_PATTERN, label_hint=label_hint)
-        if v: return v
-        v = _order_from_text_by_pattern(full_text_upper, PHBBT_ORDER_PATTERN, label_hint=label_hint)
-        if v: return v
-        v = _order_from_tables_by_pattern(pdf_path, PHBBT_ORDER_PATTERN)
-        if v: return v
-        v = _order_from_text_by_pattern(full_text_upper, PHBBT_ORDER_PATTERN)
-        if v: return v
-        v = _order_from_filename_by_pattern(pdf_path, PHBBT_ORDER_PATTERN)
-        if v: return v
-        # bare 8H#### soft fallback
-        v = _order_from_text_by_pattern(full_text_upper, PHCDT_ORDER_PATTERN)
-        if v: return v
-        v = _order_from_tables_by_pattern(pdf_path, PHCDT_ORDER_PATTERN)
-        if v: return v
-        # TSA-window fallback on full text
-        v = _order_from_tsa_text(full_text_upper)
-        if v: return v
-        return _any_orderish_from_tables_or_text(pdf_path, full_text_upper)
+        return [
+            ("tables_label", lambda: _order_from_tables_by_pattern(tables, PHBBT_ORDER_PATTERN, label_hint=PHBBT_LABEL_HINT)),
+            ("text_label", lambda: _order_from_text_candidates(cands, "phbbt_order", hint_kind="phbbt_hint")),
+            ("tables", lambda: _order_from_tables_by_pattern(tables, PHBBT_ORDER_PATTERN)),
+            ("text", lambda: _order_from_text_candidates(cands, "phbbt_order")),
+            ("filename", lambda: _order_from_filename_by_pattern(pdf_path, PHBBT_ORDER_PATTERN)),
+            # bare 8H#### soft fallback
+            ("text_8h", lambda: _order_from_text_candidates(cands, "phcdt_order")),
+            ("tables_8h", lambda: _order_from_tables_by_pattern(tables, PHCDT_ORDER_PATTERN)),
+            # TSA-window fallback on full text
+            ("tsa_window", lambda: _order_from_tsa_text(cands)),
+            ("any_orderish", lambda: _any_orderish_from_tables_or_text(tables, cands)),
+        ]
 
     # Default / PHCDT
-    label_hint = "9 ORDER NO."
-    v = _order_from_tables_by_pattern(pdf_path, PHCDT_ORDER_PATTERN, label_hint=label_hint)
-    if v: return v
-    v = _order_from_text_by_pattern(full_text_upper, PHCDT_ORDER_PATTERN, label_hint=label_hint)
-    if v: return v
-    v = _order_from_tables_by_pattern(pdf_path, PHCDT_ORDER_PATTERN)
-    if v: return v
-    v = _order_from_text_by_pattern(full_text_upper, PHCDT_ORDER_PATTERN)
-    if v: return v
-    v = _order_from_filename_by_pattern(pdf_path, PHCDT_ORDER_PATTERN)
-    if v: return v
-    # optional legacy 6 digits
-    legacy_six = r"\b\d{6}\b"
-    v = _order_from_text_by_pattern(full_text_upper, legacy_six, label_hint=label_hint)
-    if v: return v
-    v = _order_from_tables_by_pattern(pdf_path, legacy_six)
-    if v: return v
-    v = _order_from_filename_by_pattern(pdf_path, legacy_six)
-    if v: return v
-    # TSA-window fallback on full text
-    v = _order_from_tsa_text(full_text_upper)
-    if v: return v
-    return _any_orderish_from_tables_or_text(pdf_path, full_text_upper)
-
-# ---------------------- Main entrypoint ----------------------
-def extract_pdf_data(pdf_path: str) -> dict:
-    data = {
-        "reference_no": None,
-        "order_no": None,
-        "shipped_from": None,
-        "carton_dimensions": None,
-        "carton_weight": None,
-        "tracking_number": None,
-        "carrier": "UNKNOWN",
-    }
+    return [
+        ("tables_label", lambda: _order_from_tables_by_pattern(tables, PHCDT_ORDER_PATTERN, label_hint=PHCDT_LABEL_HINT)),
+        ("text_label", lambda: _order_from_text_candidates(cands, "phcdt_order", hint_kind="phcdt_hint")),
+        ("tables", lambda: _order_from_tables_by_pattern(tables, PHCDT_ORDER_PATTERN)),
+        ("text", lambda: _order_from_text_candidates(cands, "phcdt_order")),
+        ("filename", lambda: _order_from_filename_by_pattern(pdf_path, PHCDT_ORDER_PATTERN)),
+        # optional legacy 6 digits
+        ("text_legacy6", lambda: _order_from_text_candidates(cands, "legacy_six", hint_kind="phcdt_hint")),
+        ("tables_legacy6", lambda: _order_from_tables_by_pattern(tables, LEGACY_SIX_PATTERN)),
+        ("filename_legacy6", lambda: _order_from_filename_by_pattern(pdf_path, LEGACY_SIX_PATTERN)),
+        # TSA-window fallback on full text
+        ("tsa_window", lambda: _order_from_tsa_text(cands)),
+        ("any_orderish", lambda: _any_orderish_from_tables_or_text(tables, cands)),
+    ]
+
+def _record_order_dispatch(log: list) -> None:
+    """Count one dispatch's strategy runs, (doc type, tier, hit, contest, changed, ms) each."""
+    learned = get_order_stats()
+    for key, tier, hit, contest, changed, ms in log:
+        learned.record(key, tier, hit=hit, contest=contest, changed=changed, ms=ms)
+    learned.dispatched()
+
+def _extract_order_no(pdf_path: str, tables: _DocTables, cands: _Candidates, doc_type: str | None,
+                      stats: Optional[_ExtractStats] = None) -> str:
+    """
+    The highest-ranked tier (see _order_tiers) that finds a value wins, but tiers run cheapest
+    first (by the recorded cost for this doc type) and stop being tried once they can no longer
+    beat the current value, so the result is the same in any order. Each run is recorded, or
+    held in stats.order_log when the caller records once per document.
+    """
+    stats = stats or _ExtractStats()
+    key = doc_type or "UNKNOWN"
+    log = []
+    tiers = _order_tiers(pdf_path, tables, cands, doc_type)
+    best = None  # (rank, value, tier)
+    remaining = list(range(len(tiers)))
+    while True:
+        live = [i for i in remaining if best is None or i < best[0]]
+        if not live:
+            break
+        costs = {i: _order_strategy_cost(tiers[i][0], tables, key) for i in live}
+        rank = min(live, key=lambda i: (max(costs[i], ORDER_CHEAP_MS), i))  # cheap ones in rank order
+        remaining.remove(rank)
+        tier, lookup = tiers[rank]
+        contest = best is not None
+        paid = tier not in _ORDER_TABLE_STRATEGIES or not tables.parsed
+        t0 = time.perf_counter()
+        v = lookup()
+        ms = (time.perf_counter() - t0) * 1000 if paid else None
+        log.append((key, tier, bool(v), contest, bool(v) and contest and v != best[1], ms))
+        if v:
+            best = (rank, v, tier)
+    if stats.order_log is None:
+        _record_order_dispatch(log)
+    else:
+        stats.order_log.extend(log)
+    if best is None:
+        return ""
+    stats.tiers["order_no"] = best[2]
+    return best[1]
+
+# ---------------------- Field extraction over a page range ----------------------
+_FIELDS = ["reference_no", "order_no", "shipped_from", "carton_dimensions", "carton_weight", "tracking_number", "carrier"]
+
+def _extract_fields(doc, pdf_path: str, st: _ExtractStats, pages: Optional[Sequence[int]] = None,
+                    window: bool = False, doc_text: Optional[_DocText] = None,
+                    ocr: Optional[_DocOcr] = None) -> tuple[dict, Optional[_PageMap]]:
+    """
+    Every field rule over the pages in `pages` (all pages by default) of an open doc.
+    A streaming `window` skips tracking OCR and parses tables on TSA pages only.
+    `doc_text` is page text already read for exactly those pages; `ocr` the document's
+    OCR results when the caller keeps them across calls.
+    Returns (fields, page map); `doc` may be None when the file could not be opened.
+    """
+    data = {k: None for k in _FIELDS}
+    data["carrier"] = "UNKNOWN"
 
     full_text_upper = ""
+    tsa_text_upper = ""
+    cands = _TEXT_SCANNER.scan("")
+    tsa_cands = None
     doc_type = None
+    pagemap = None
 
-    # Read all text up-front
+    # Read all text up-front (once per page; every stage reads from `text`)
     try:
-        with fitz.open(pdf_path) as doc:
-            for page in doc:
-                full_text_upper += page.get_text().upper()
-
-            # --- TSA-targeted text + pages (scoped) ---
-            tsa_text_upper, tsa_pages = _collect_tsa_text(doc)
-
-            # reference_no & doc_type (global scan)
-            mref = re.search(PH_REF_PATTERN, full_text_upper)
-            if mref:
-                ref = mref.group(0).replace(" ", "").upper()
-                data["reference_no"] = ref
-                if ref.startswith("PHCDT"):
-                    doc_type = "PHCDT"
-                elif ref.startswith("PHBBT"):
-                    doc_type = "PHBBT"
-
-            # Prefer TSA page reference if available
+        with st.stage("text"):
+            text = doc_text if doc_text is not None else _DocText(doc, pages, ocr)
+            full_text_upper = text.full_upper()
+
+        # Route pages once: TSA / label / scan / other
+        with st.stage("classify"):
+            pagemap = _PageMap(doc, text)
+
+        # --- TSA-targeted text + pages (scoped) ---
+        with st.stage("tsa"):
+            tsa_text_upper, tsa_pages = _collect_tsa_text(doc, text, st, pagemap)
+        pagemap.ocr_tsa.update(pi for pi in tsa_pages if pagemap.kinds[pi] == PAGE_SCAN)
+        if pagemap.ocr_tsa:
+            full_text_upper += tsa_text_upper  # a scanned TSA's fields exist only in its OCR text
+
+        # One pass over each text collects every field candidate; the steps below pick from them
+        with st.stage("scan"):
+            cands = _TEXT_SCANNER.scan(full_text_upper)
             if tsa_text_upper:
-                ref_tsa = _extract_ref_from_tsa_text(tsa_text_upper)
-                if ref_tsa:
-                    data["reference_no"] = ref_tsa
-                    if ref_tsa.startswith("PHBBT"):
-                        doc_type = "PHBBT"
-                    elif ref_tsa.startswith("PHCDT"):
-                        doc_type = doc_type or "PHCDT"
-
-            # shipped_from: Boeing block on any page
-            shipped_from = ""
-            for p in range(len(doc)):
-                block = _extract_boeing_block_from_page_text(doc[p].get_text())
-                if block:
-                    shipped_from = block
-                    break
-            if shipped_from:
-                data["shipped_from"] = shipped_from
-
-            # dimensions / weight
-            md = re.search(DIM_PATTERN, full_text_upper)
-            if md:
-                data["carton_dimensions"] = md.group(0).replace(" ", "").upper()
-
-            mw = re.search(WEIGHT_PATTERN, full_text_upper, flags=re.IGNORECASE | re.DOTALL)
-            if mw:
-                data["carton_weight"] = f"{mw.group(1)} LB"
+                tsa_cands = _TEXT_SCANNER.scan(tsa_text_upper)
+
+        # reference_no & doc_type (global scan)
+        mref = cands.first("ref")
+        if mref:
+            ref = mref.group(0).replace(" ", "").upper()
+            data["reference_no"] = ref
+            if ref.startswith("PHCDT"):
+                doc_type = "PHCDT"
+            elif ref.startswith("PHBBT"):
+                doc_type = "PHBBT"
 
-            # tracking + carrier (keep existing behavior; not required for now)
-            trk = _extract_tracking_from_doc(doc)
-            if trk:
-                data["tracking_number"] = trk
-                data["carrier"] = _infer_carrier(trk)
-            else:
-                data["carrier"] = "UNDEFINED"
+        # Prefer TSA page reference if available
+        if tsa_text_upper:
+            ref_tsa = _extract_ref_from_tsa_text(tsa_cands)
+            if ref_tsa:
+                data["reference_no"] = ref_tsa
+                if ref_tsa.startswith("PHBBT"):
+                    doc_type = "PHBBT"
+                elif ref_tsa.startswith("PHCDT"):
+                    doc_type = doc_type or "PHCDT"
+
+        # shipped_from: Boeing block on any page
+        shipped_from = ""
+        for p in text.pages:
+            block = _extract_boeing_block_from_page_lines(text.lines[p])
+            if block:
+                shipped_from = block
+                break
+        if shipped_from:
+            data["shipped_from"] = shipped_from
+
+        # dimensions / weight
+        md = cands.first("dims")
+        if md:
+            data["carton_dimensions"] = md.group(0).replace(" ", "").upper()
+
+        weight = _weight_from_candidates(cands)
+        if weight:
+            data["carton_weight"] = f"{weight} LB"
+
+        # tracking + carrier (keep existing behavior; not required for now)
+        with st.stage("tracking"):
+            trk = _extract_tracking_from_doc(doc, text, st, pagemap, ocr=not window)
+        if trk:
+            data["tracking_number"] = trk
+            data["carrier"] = _infer_carrier(trk)
+            if not window and not _tracking_check_ok(trk):
+                st.count("tracking_unverified")
+        else:
+            data["carrier"] = "UNDEFINED"
 
     except Exception as e:
-        print(f"PyMuPDF text extraction failed: {e}")
+        if doc is not None:  # a file that failed to open was already reported
+            print(f"PyMuPDF text extraction failed: {e}")
 
     # If doc_type missing, infer from filename
     if not doc_type:
@@ -582,41 +1338,287 @@ def extract_pdf_data(pdf_path: str) -> dict:
             doc_type = "PHCDT"
 
     # Try TSA-derived order first (scoped to TSA page)
-    if 'tsa_text_upper' in locals() and tsa_text_upper and not data.get("order_no"):
-        v_tsa = _order_from_tsa_text(tsa_text_upper)
+    if tsa_text_upper and not data.get("order_no"):
+        v_tsa = _order_from_tsa_text(tsa_cands)
         if v_tsa:
             data["order_no"] = v_tsa
 
-    # Order no via doc-type rules (keeps your PHCDT/PHBBT logic)
-    order_no = ""
-    if tsa_text_upper:
-        order_no = _order_from_tsa_text(tsa_text_upper)
-    
-    if not order_no:
-        order_no = _extract_order_no(pdf_path, full_text_upper, doc_type)
-    
+    # Order no via doc-type rules (keeps your PHCDT/PHBBT logic);
+    # the doc stays open so table fallbacks can parse it in-process, once.
+    with st.stage("order"):
+        order_no = ""
+        if tsa_text_upper:
+            order_no = _order_from_tsa_text(tsa_cands)
+            if order_no:
+                st.tiers["order_no"] = "tsa_text"
+
+        if not order_no:
+            tables = _DocTables(doc, pdf_path, st, pagemap, tsa_only=window)
+            order_no = _extract_order_no(pdf_path, tables, cands, doc_type, st)
+
     if order_no:
         data["order_no"] = order_no.strip().upper()
 
     # Final preference: if both PHCDT and PHBBT exist, favor TSA-page PHBBT when current ref is PHCDT
-    if 'tsa_text_upper' in locals() and tsa_text_upper and data.get("reference_no"):
+    if tsa_text_upper and data.get("reference_no"):
         if "PHCDT" in full_text_upper and "PHBBT" in tsa_text_upper and data["reference_no"].startswith("PHCDT"):
-            ref_tsa = _extract_ref_from_tsa_text(tsa_text_upper)
+            ref_tsa = _extract_ref_from_tsa_text(tsa_cands)
             if ref_tsa:
                 data["reference_no"] = ref_tsa
                 doc_type = "PHBBT"
 
+    return data, pagemap
+
+# ---------------------- Streaming (very large PDFs) ----------------------
+# Documents with at least STREAM_MIN_PAGES pages are read STREAM_WINDOW pages at a time
+# (0 = never stream); only one window of text, tables and candidates is alive at once.
+STREAM_MIN_PAGES = int(os.getenv("ITOCHU_STREAM_MIN_PAGES", "100") or 0)
+STREAM_WINDOW = max(2, int(os.getenv("ITOCHU_STREAM_WINDOW", "10") or 10))
+# The walk stops once these are resolved (shipped_from is missing from many bundles)
+STREAM_STOP_FIELDS = [f.strip() for f in os.getenv(
+    "ITOCHU_STREAM_STOP_FIELDS", "reference_no,order_no,carton_dimensions,carton_weight,tracking_number"
+).split(",") if f.strip()]
+
+# Order tiers that don't depend on where the text sits (any 6-digit number, the file name, ...);
+# held back while later windows may still match
+_WEAK_ORDER_TIERS = ("filename", "filename_legacy6", "any_orderish", "text_legacy6", "tables_legacy6")
+
+def _use_streaming(n_pages: int) -> bool:
+    return STREAM_MIN_PAGES > 0 and n_pages >= STREAM_MIN_PAGES
+
+def _extract_streaming(doc, pdf_path: str, st: _ExtractStats, pages: Optional[Sequence[int]] = None,
+                       ocr: Optional[_DocOcr] = None) -> dict:
+    """
+    Visit `pages` (all by default) in order, one window at a time. Each window overlaps the
+    previous one by a page so values that cross a page break still match. A field takes its
+    value from the earliest window that yields one. order_no is only taken from a strong tier
+    once a window holding a TSA page has been seen: pages before the TSA carry lot and part
+    numbers, and no reference to tell the doc type, so their hits (and weak tiers) are kept for
+    when nothing better turns up. The walk stops as soon as every STREAM_STOP_FIELDS field is resolved. Tracking OCR runs once, after
+    the walk, and only if no window had a check-digit-valid tracking number in its text.
+    All windows share `ocr` (one per document), so no page is OCRed twice. The order
+    dispatcher is recorded once, for the window whose value was kept (else the last one).
+    """
+    data = {k: None for k in _FIELDS}
+    tiers = dict(st.tiers)
+    held_order = {}         # {weak tier?: (value, tier, log)} first hits not taken, used only if nothing is
+    order_log = None        # order dispatcher runs of the window order_no came from
+    seen_tsa = False
+    weak_tracking = None    # (value, tier) that failed its check digit, used only if nothing validates
+    ocr_pages: list[int] = []
+    ocr = ocr if ocr is not None else _DocOcr(doc)
+    pages = list(range(len(doc)) if pages is None else pages)
+    start = 0
+    while start < len(pages):
+        span = pages[max(0, start - 1):start + STREAM_WINDOW]
+        new = pages[start:start + STREAM_WINDOW]
+        st.count("stream_windows")
+        st.tiers = {k: None for k in st.tiers}
+        st.order_log = []
+        part, pagemap = _extract_fields(doc, pdf_path, st, span, window=True, ocr=ocr)
+        if pagemap is not None:
+            ocr_pages.extend(p for p in pagemap.tracking_ocr_pages() if p >= new[0])
+            for p in new:
+                st.page_kinds[pagemap.kinds[p]] = st.page_kinds.get(pagemap.kinds[p], 0) + 1
+
+        seen_tsa = seen_tsa or st.tiers["order_no"] == "tsa_text" or (
+            pagemap is not None and any(pagemap.kinds[p] == PAGE_TSA for p in span))
+        if part["order_no"] and not data["order_no"]:
+            weak = st.tiers["order_no"] in _WEAK_ORDER_TIERS
+            if seen_tsa and not weak:
+                data["order_no"], tiers["order_no"] = part["order_no"], st.tiers["order_no"]
+                order_log = st.order_log
+            else:
+                held_order.setdefault(weak, (part["order_no"], st.tiers["order_no"], st.order_log))
+        for k in ("reference_no", "shipped_from", "carton_dimensions", "carton_weight"):
+            if not data[k] and part[k]:
+                data[k] = part[k]
+        if part["tracking_number"] and not data["tracking_number"]:
+            if _tracking_check_ok(part["tracking_number"]):
+                data["tracking_number"], tiers["tracking_number"] = part["tracking_number"], st.tiers["tracking_number"]
+                data["carrier"] = part["carrier"]
+            else:
+                weak_tracking = weak_tracking or (part["tracking_number"], st.tiers["tracking_number"])
+        st.count("pages", len(new))
+        start += len(new)
+        if all(data.get(k) for k in STREAM_STOP_FIELDS):
+            break
+
+    st.tiers = tiers
+    if not data["order_no"] and held_order:
+        data["order_no"], st.tiers["order_no"], order_log = held_order[min(held_order)]  # a strong tier (False) first
+    order_log = order_log if order_log is not None else st.order_log
+    st.order_log = None
+    if order_log:  # empty: the dispatcher did not run (TSA text had the order, or no window ran)
+        _record_order_dispatch(order_log)
+
+    if not data["tracking_number"]:
+        with st.stage("tracking"):
+            trk, tier = _tracking_from_ocr(doc, st, ocr_pages, ocr), "ocr"
+        # unverified: a label hit beats an OCR read, which beats a bare UPS-shaped number
+        if weak_tracking and not (trk and _tracking_check_ok(trk)):
+            if weak_tracking[1] == "text_label" or not trk:
+                trk, tier = weak_tracking
+        if trk:
+            st.tiers["tracking_number"] = tier
+            data["tracking_number"] = trk
+            data["carrier"] = _infer_carrier(trk)
+            if not _tracking_check_ok(trk):
+                st.count("tracking_unverified")
+        else:
+            data["carrier"] = "UNDEFINED"
+    return data
+
+# ---------------------- Main entrypoints ----------------------
+def _print_and_validate(pdf_path: str, data: dict, title: str = "") -> None:
     # Print and validate (TEMP: require only reference_no & order_no)
     print("\n[PDF Extract] ===============================")
-    print(f"File: {_filename(pdf_path)}")
-    for k in ["reference_no", "order_no", "shipped_from", "carton_dimensions", "carton_weight", "tracking_number", "carrier"]:
+    print(f"File: {_filename(pdf_path)}{title}")
+    for k in _FIELDS:
         print(f"  {k}: {data.get(k)}")
-    if not _OCR_AVAILABLE:
-        print(f"  [NOTE] OCR disabled: {_OCR_REASON}  --> UPS label text/images will not be parsed.")
+    if not _ocr_available():
+        print(f"  [NOTE] OCR disabled: {_ocr_status()[1]}  --> UPS label text/images will not be parsed.")
     print("===========================================\n")
 
     required_now = ["reference_no", "order_no"]  # TEMP: focus on these only
     missing = [k for k in required_now if not data.get(k) or (isinstance(data.get(k), str) and not data.get(k).strip())]
     if missing:
-        raise ValueError(f"Missing required extracted fields: {', '.join(missing)}")
+        raise ValueError(f"Missing required extracted fields{title}: {', '.join(missing)}")
+
+def extract_pdf_data(pdf_path: str, stats: Optional[dict] = None, streaming: Optional[bool] = None) -> dict:
+    """
+    Extract shipment fields from one PDF. Pass a dict as `stats` to receive per-stage
+    timings (ms), OCR/table cost counters and the fallback tier that produced
+    order_no / tracking_number; it is filled even when required fields are missing.
+    `streaming` forces the windowed page walk on or off (default: by page count).
+    """
+    st = _ExtractStats()
+    started = time.perf_counter()
+    doc = None
+    try:
+        with st.stage("text"):
+            doc = fitz.open(pdf_path)
+    except Exception as e:
+        print(f"PyMuPDF text extraction failed: {e}")
+    try:
+        if doc is not None and (streaming if streaming is not None else _use_streaming(len(doc))):
+            data = _extract_streaming(doc, pdf_path, st)
+        else:
+            data, pagemap = _extract_fields(doc, pdf_path, st)
+            if pagemap is not None:
+                st.count("pages", len(doc))
+                st.page_kinds = pagemap.counts()
+    finally:
+        if doc is not None:
+            doc.close()
+
+    st.stages_ms["total"] = (time.perf_counter() - started) * 1000
+    if stats is not None:
+        stats.update(st.as_dict())
+
+    _print_and_validate(pdf_path, data)
     return data
+
+def _tsa_page_ref(text_upper: str) -> str:
+    m = re.search(PH_REF_PATTERN, text_upper)
+    return m.group(0).replace(" ", "").replace("-", "") if m else ""
+
+def _page_group_key(text_upper: str) -> tuple[str, str]:
+    """(page kind for grouping: PAGE_TSA, PAGE_LABEL or "", the PH reference it shows or "")."""
+    if _is_tsa_page(text_upper):
+        kind = PAGE_TSA
+    elif any(kw in text_upper for kw in _LABEL_KEYWORDS):
+        kind = PAGE_LABEL
+    else:
+        kind = ""
+    return kind, _tsa_page_ref(text_upper)
+
+def _shipment_groups(page_keys: list[tuple[str, str]]) -> list[list[int]]:
+    """
+    Pages of each shipment in a bundle, from _page_group_key of every page. A shipment starts
+    at a TSA page; a TSA page with the same reference as the one before it, or none, continues
+    it. Any other page showing a TSA's reference (labels print "REF: PHCDT-...") joins that
+    shipment. The rest go by position: with the shipment of the TSA before them, except that
+    in a bundle whose labels come before their TSA (a label precedes the first TSA) a label
+    without a readable reference joins the TSA after it.
+    """
+    starts, refs, last_ref = [], [], None
+    for i, (kind, ref) in enumerate(page_keys):
+        if kind != PAGE_TSA:
+            continue
+        if not starts or (ref and ref != last_ref):
+            starts.append(i)
+            refs.append(ref)
+        elif ref and not refs[-1]:
+            refs[-1] = ref
+        last_ref = ref or last_ref
+    if len(starts) < 2:
+        return [list(range(len(page_keys)))]
+    by_ref = {ref: g for g, ref in enumerate(refs) if ref}
+    labels_first = any(kind == PAGE_LABEL for kind, _ in page_keys[:starts[0]])
+    groups: list[list[int]] = [[] for _ in starts]
+    for i, (kind, ref) in enumerate(page_keys):
+        g = bisect.bisect_right(starts, i) - 1        # the TSA at or before this page
+        if kind != PAGE_TSA and ref in by_ref:
+            g = by_ref[ref]
+        elif kind == PAGE_LABEL and labels_first:
+            g = bisect.bisect_right(starts, i)        # the TSA after it
+        groups[min(max(g, 0), len(groups) - 1)].append(i)
+    return groups
+
+def extract_pdf_records(pdf_path: str, stats: Optional[dict] = None, streaming: Optional[bool] = None) -> list[dict]:
+    """
+    Extract every shipment in one PDF: a bundle with several TSA pages yields one record per
+    TSA page group (its own reference, order, carton and tracking fields), anything else a
+    single record like extract_pdf_data. The document is opened and its text read once, except
+    when streamed (`streaming`, default: by page count): then a first read keeps only each
+    page's grouping key, and every group is walked in windows like extract_pdf_data does.
+    Raises ValueError if any record lacks the required fields.
+    """
+    st = _ExtractStats()
+    started = time.perf_counter()
+    records = []
+    doc = None
+    text = None
+    try:
+        with st.stage("text"):
+            doc = fitz.open(pdf_path)
+            if streaming if streaming is not None else _use_streaming(len(doc)):
+                page_keys = [_page_group_key(page.get_text().upper()) for page in doc]
+            else:
+                text = _DocText(doc)
+                page_keys = [_page_group_key(t) for t in text.upper]
+    except Exception as e:
+        print(f"PyMuPDF text extraction failed: {e}")
+        if doc is not None:  # opened but unreadable: same as a file that failed to open
+            doc.close()
+            doc = None
+    try:
+        if doc is None:
+            records.append(_extract_fields(None, pdf_path, st)[0])
+        elif text is None:
+            ocr = _DocOcr(doc)
+            for group in _shipment_groups(page_keys):
+                records.append(_extract_streaming(doc, pdf_path, st, group, ocr))
+        else:
+            st.count("pages", len(doc))
+            groups = _shipment_groups(page_keys)
+            for group in groups:
+                part_text = text if len(groups) == 1 else text.subset(group)
+                data, pagemap = _extract_fields(doc, pdf_path, st, group, doc_text=part_text)
+                records.append(data)
+                if pagemap is not None:
+                    for p in group:
+                        st.page_kinds[pagemap.kinds[p]] = st.page_kinds.get(pagemap.kinds[p], 0) + 1
+    finally:
+        if doc is not None:
+            doc.close()
+    st.count("records", len(records))
+
+    st.stages_ms["total"] = (time.perf_counter() - started) * 1000
+    if stats is not None:
+        stats.update(st.as_dict())
+
+    for n, data in enumerate(records, 1):
+        _print_and_validate(pdf_path, data, f" (shipment {n}/{len(records)})" if len(records) > 1 else "")
+    return records
@@ -0,0 +1,96 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+# Local SQLite file (kept next to itochu_auto.db by default). Set to "" to disable caching.
+OCR_CACHE_PATH = os.getenv("ITOCHU_OCR_CACHE_PATH", "./ocr_cache.db")
+OCR_CACHE_MAX_MB = float(os.getenv("ITOCHU_OCR_CACHE_MAX_MB", "64"))
+
+# After an eviction the cache is trimmed to this fraction of the cap, so puts don't evict every time
+_EVICT_TO = 0.9
+
+def ocr_cache_key(samples: bytes, width: int, height: int, render: str, engine: str) -> str:
+    """Hash of the rendered pixels plus everything that can change the OCR output for them."""
+    h = hashlib.sha256()
+    h.update(f"{width}x{height}|{render}|{engine}|".encode())
+    h.update(samples)
+    return h.hexdigest()
+
+class OcrCache:
+    """
+    Persistent OCR text cache with size-based LRU eviction.
+    Safe to share between threads; each worker process opens its own connection.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_cache ("
+            " key TEXT PRIMARY KEY,"
+            " text TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_ocr_cache_last_used ON ocr_cache (last_used)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM ocr_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE ocr_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, text: str) -> None:
+        size = len(text.encode("utf-8")) + len(key)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ocr_cache (key, text, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, text, size, time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM ocr_cache")
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * _EVICT_TO
+        stale = []
+        for key, size in self._conn.execute("SELECT key, size FROM ocr_cache ORDER BY last_used ASC"):
+            if total <= target:
+                break
+            stale.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM ocr_cache WHERE key = ?", stale)
+
+_cache: Optional[OcrCache] = None
+_cache_pid: Optional[int] = None
+
+def get_ocr_cache() -> Optional[OcrCache]:
+    """Per-process cache handle (reopened after fork); None when disabled or unusable."""
+    global _cache, _cache_pid
+    if not OCR_CACHE_PATH:
+        return None
+    if _cache_pid != os.getpid():
+        _cache_pid = os.getpid()
+        try:
+            _cache = OcrCache(OCR_CACHE_PATH, int(OCR_CACHE_MAX_MB * 1024 * 1024))
+        except Exception as e:
+            print(f"[extractor] OCR cache unavailable ({OCR_CACHE_PATH}): {e}")
+            _cache = None
+    return _cache
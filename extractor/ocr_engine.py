@@ -0,0 +1,141 @@
+import importlib
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional
+
+# auto: tesserocr (Tesseract API in-process) when installed, else pytesseract (one tesseract run per image)
+# tesserocr / pytesseract: force one engine
+OCR_ENGINE = os.getenv("ITOCHU_OCR_ENGINE", "auto").lower()
+OCR_LANG = os.getenv("ITOCHU_OCR_LANG", "eng")
+# tesseract binary for pytesseract; defaults to PATH (or the standard install dir on Windows)
+TESSERACT_CMD = os.getenv("ITOCHU_TESSERACT_CMD", "")
+# tessdata directory for tesserocr; empty = Tesseract's own default / TESSDATA_PREFIX
+TESSDATA_PATH = os.getenv("ITOCHU_TESSDATA_PATH", "")
+
+_WINDOWS_TESSERACT = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+
+# One recognised word: pixel box, reading-order line number, text
+Word = tuple[int, int, int, int, int, str]
+
+class OcrEngine(ABC):
+    """
+    OCR backend over a raw 8-bit pixel buffer (rows packed, `channels` bytes per pixel,
+    e.g. a fitz Pixmap's samples or samples_mv). `name` identifies engine + version in
+    OCR cache keys.
+    """
+
+    name = ""
+
+    def recognize(self, samples, width: int, height: int, channels: int) -> str:
+        return words_to_text(self.recognize_words(samples, width, height, channels))
+
+    @abstractmethod
+    def recognize_words(self, samples, width: int, height: int, channels: int) -> list[Word]:
+        ...
+
+def words_to_text(words: list[Word]) -> str:
+    """Words joined by spaces within a line, lines by newlines, in reading order."""
+    lines: dict[int, list[str]] = {}
+    for *_, line, text in words:
+        lines.setdefault(line, []).append(text)
+    return "\n".join(" ".join(ws) for _, ws in sorted(lines.items()))
+
+class TesserocrEngine(OcrEngine):
+    """One Tesseract API handle for the life of the process; language data is loaded once."""
+
+    def __init__(self):
+        tesserocr = importlib.import_module("tesserocr")
+        kwargs = {"lang": OCR_LANG}
+        if TESSDATA_PATH:
+            kwargs["path"] = TESSDATA_PATH
+        self._api = tesserocr.PyTessBaseAPI(**kwargs)
+        self._ril = tesserocr.RIL
+        self._iterate_level = tesserocr.iterate_level
+        self._lock = threading.Lock()  # an API handle serves one image at a time
+        self.name = f"tesserocr {tesserocr.tesseract_version().splitlines()[0]}"
+
+    def recognize_words(self, samples, width: int, height: int, channels: int) -> list[Word]:
+        words, line = [], -1
+        with self._lock:
+            self._api.SetImageBytes(bytes(samples), width, height, channels, width * channels)
+            self._api.Recognize()
+            it = self._api.GetIterator()
+            if it is None:
+                return words
+            for w in self._iterate_level(it, self._ril.WORD):
+                if w.IsAtBeginningOf(self._ril.TEXTLINE):
+                    line += 1
+                text = (w.GetUTF8Text(self._ril.WORD) or "").strip()
+                box = w.BoundingBox(self._ril.WORD)
+                if text and box:
+                    words.append((*box, max(line, 0), text))
+        return words
+
+class PytesseractEngine(OcrEngine):
+    """Fallback: pytesseract runs the tesseract binary once per image."""
+
+    _MODES = {1: "L", 3: "RGB", 4: "RGBA"}
+
+    def __init__(self):
+        self._pytesseract = importlib.import_module("pytesseract")
+        self._output = self._pytesseract.Output
+        self._image = importlib.import_module("PIL.Image")
+        cmd = TESSERACT_CMD or (_WINDOWS_TESSERACT if os.name == "nt" and os.path.exists(_WINDOWS_TESSERACT) else "")
+        if cmd:
+            self._pytesseract.pytesseract.tesseract_cmd = cmd
+        self.name = f"tesseract {self._pytesseract.get_tesseract_version()}"
+
+    def _image_of(self, samples, width: int, height: int, channels: int):
+        mode = self._MODES[channels]
+        return self._image.frombuffer(mode, (width, height), samples, "raw", mode, 0, 1)  # no copy
+
+    def recognize(self, samples, width: int, height: int, channels: int) -> str:
+        return self._pytesseract.image_to_string(self._image_of(samples, width, height, channels), lang=OCR_LANG)
+
+    def recognize_words(self, samples, width: int, height: int, channels: int) -> list[Word]:
+        data = self._pytesseract.image_to_data(
+            self._image_of(samples, width, height, channels), lang=OCR_LANG, output_type=self._output.DICT
+        )
+        words, lines = [], {}
+        for i, text in enumerate(data["text"]):
+            text = (text or "").strip()
+            if not text:
+                continue
+            key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            line = lines.setdefault(key, len(lines))
+            x, y, w, h = data["left"][i], data["top"][i], data["width"][i], data["height"][i]
+            words.append((x, y, x + w, y + h, line, text))
+        return words
+
+_ENGINES = {"tesserocr": TesserocrEngine, "pytesseract": PytesseractEngine}
+
+_engine: Optional[OcrEngine] = None
+_engine_reason = ""
+_engine_pid: Optional[int] = None
+
+def get_ocr_engine() -> tuple[Optional[OcrEngine], str]:
+    """
+    (engine, reason) for this process, created on first use and reused afterwards
+    (a forked worker builds its own). engine is None when no backend works; reason says why.
+    """
+    global _engine, _engine_reason, _engine_pid
+    if _engine_pid != os.getpid():
+        _engine_pid = os.getpid()
+        _engine, _engine_reason = None, ""
+        names = ["tesserocr", "pytesseract"] if OCR_ENGINE == "auto" else [OCR_ENGINE]
+        errors = []
+        for name in names:
+            factory = _ENGINES.get(name)
+            if factory is None:
+                errors.append(f"unknown OCR engine '{name}'")
+                continue
+            try:
+                _engine = factory()
+                _engine_reason = "ok"
+                break
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+        if _engine is None:
+            _engine_reason = "; ".join(errors)
+    return _engine, _engine_reason
@@ -0,0 +1,115 @@
+import importlib
+import multiprocessing.util
+import os
+import threading
+import time
+from typing import Optional
+
+# "1": learn from / record to the app database (order_strategy_stats); "0": this process only
+ORDER_STATS_DB = os.getenv("ITOCHU_ORDER_STATS", "1") == "1"
+
+_FLUSH_EVERY = 20       # dispatches between writes to the database
+_FLUSH_SECONDS = 60.0   # ...or seconds, whichever comes first; counts are also re-read then
+_COUNTERS = ("attempts", "hits", "contests", "changed", "timed", "total_ms")
+
+def _empty() -> dict:
+    return {k: 0 for k in _COUNTERS}
+
+class OrderStrategyStats:
+    """
+    Per (doc type, strategy) counters for the order-number dispatcher:
+      attempts / hits   - runs and runs that returned a value
+      contests          - runs made while a lower-ranked strategy already had a value
+      changed           - contests where this strategy's value replaced that one
+      timed / total_ms  - runs that paid their own cost, and that cost
+    Counts merge this process's unsaved deltas with the database totals.
+    """
+
+    def __init__(self, persist: bool):
+        self._persist = persist
+        self._lock = threading.Lock()
+        self._saved: dict[tuple[str, str], dict] = {}
+        self._pending: dict[tuple[str, str], dict] = {}
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+        if self._persist:
+            self._load()
+
+    def _db(self):
+        return importlib.import_module("database.utils")
+
+    def _load(self) -> None:
+        try:
+            db = self._db()
+            if not db.order_strategy_stats_ready():  # app database not initialised: this process only
+                self._persist = False
+                return
+            self._saved = db.load_order_strategy_stats()
+        except Exception as e:
+            print(f"[extractor] order strategy stats not persisted: {e}")
+            self._persist = False
+
+    def get(self, doc_type: str, strategy: str) -> dict:
+        saved = self._saved.get((doc_type, strategy))
+        pending = self._pending.get((doc_type, strategy))
+        return {k: (saved or {}).get(k, 0) + (pending or {}).get(k, 0) for k in _COUNTERS}
+
+    def avg_ms(self, doc_type: str, strategy: str) -> Optional[float]:
+        s = self.get(doc_type, strategy)
+        return s["total_ms"] / s["timed"] if s["timed"] >= 5 else None
+
+    def record(self, doc_type: str, strategy: str, hit: bool, contest: bool, changed: bool,
+               ms: Optional[float]) -> None:
+        with self._lock:
+            d = self._pending.setdefault((doc_type, strategy), _empty())
+            d["attempts"] += 1
+            d["hits"] += int(hit)
+            d["contests"] += int(contest)
+            d["changed"] += int(changed)
+            if ms is not None:
+                d["timed"] += 1
+                d["total_ms"] += ms
+
+    def dispatched(self) -> None:
+        """Called once per dispatch; writes pending counts every few dispatches/seconds."""
+        self._unflushed += 1
+        if self._unflushed >= _FLUSH_EVERY or time.monotonic() - self._last_flush >= _FLUSH_SECONDS:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._unflushed = 0
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+        if not self._persist:
+            for key, d in pending.items():
+                saved = self._saved.setdefault(key, _empty())
+                for k in _COUNTERS:
+                    saved[k] += d[k]
+            return
+        try:
+            db = self._db()
+            db.add_order_strategy_stats(pending)
+            self._saved = db.load_order_strategy_stats()
+        except Exception as e:
+            print(f"[extractor] could not save order strategy stats: {e}")
+            with self._lock:
+                for key, d in pending.items():
+                    merged = self._pending.setdefault(key, _empty())
+                    for k in _COUNTERS:
+                        merged[k] += d[k]
+
+_stats: Optional[OrderStrategyStats] = None
+_stats_pid: Optional[int] = None
+
+def get_order_stats() -> OrderStrategyStats:
+    """Per-process stats handle (rebuilt after fork); unsaved counts are written at exit."""
+    global _stats, _stats_pid
+    if _stats_pid != os.getpid():
+        _stats_pid = os.getpid()
+        _stats = OrderStrategyStats(ORDER_STATS_DB)
+        # runs at interpreter exit and when a pool worker process exits (atexit does not)
+        multiprocessing.util.Finalize(_stats, _stats.flush, exitpriority=10)
+    return _stats
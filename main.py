@@ -1,14 +1,16 @@
 import os
 import time
-import shutil
+from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
 
-from extractor.extractor import extract_pdf_data
 from database.db import init_db
-from database.utils import save_shipment
-from shipper.shipper import run_shipper_flow
-import smtplib
+from database.utils import enqueue_job, due_jobs, next_job_retry, recover_jobs, job_state_counts, oldest_unfinished_job
+from watcher.events import FolderWatcher
+from watcher.index import DirectoryIndex
+from watcher.pipeline import run_pipeline
+from watcher.notify import SummaryDispatcher
+from watcher import metrics, profiling
 from email.message import EmailMessage
 
 WATCH_FOLDER = os.getenv("WATCH_FOLDER", r"C:\Users\KoseiShidoKLLUS-MIS\OneDrive - K Line Logistics U.S.A. Inc\Itochu Aviation (America) CH-47 - General\Test")
@@ -26,10 +28,7 @@ EMAIL_USER = os.getenv("EMAIL_USER")
 EMAIL_PASS = os.getenv("EMAIL_PASS")
 EMAIL_TO = os.getenv("EMAIL_TO")
 
-def send_summary_email(successful, failed):
-  if not successful and not failed:
-    return
-  
+def summary_message(successful, failed):
   subject = '[Itochu Auto] PDF to TW Shipment Processing'
   body = "The following shipments were processed:\n\n"
   if successful:
@@ -48,42 +47,77 @@ def send_summary_email(successful, failed):
   msg["From"] = EMAIL_USER
   msg["To"] = EMAIL_TO
   msg.set_content(body)
+  return msg
 
-  try:
-    with smtplib.SMTP("smtp.office365.com", 587) as smtp:
-      smtp.starttls()
-      smtp.login(EMAIL_USER, EMAIL_PASS)
-      smtp.send_message(msg)
-    print("Summary email sent.")
-  except Exception as e:
-    print(f"Failed to send email: {e}")
-
-
-def process_new_pdfs():
-  successful, failed = [], []
-  for pdf in Path(WATCH_FOLDER).glob("*.pdf"):
-    try:
-      print(f"Processing {pdf}")
-      data = extract_pdf_data(str(pdf))
-      save_shipment(data, filename=pdf.name)
-      rcn_number, rc_num = run_shipper_flow()
-      shutil.move(str(pdf), COMPLETED_FOLDER / pdf.name)
-      successful.append((pdf.name, data, rcn_number, rc_num))
-    except Exception as e:
-      print(f"Failed on {pdf}: {e}")
-      shutil.move(str(pdf), ISSUE_FOLDER / pdf.name)
-      failed.append(pdf.name)
-  return successful, failed
+# Sends from a background thread (digest window, retries, reused connection); see watcher/notify.py
+notifier = None
+
+def send_summary_email(successful, failed):
+  global notifier
+  if not successful and not failed:
+    return
+  if notifier is None:
+    notifier = SummaryDispatcher(summary_message, EMAIL_USER, EMAIL_PASS)
+  notifier.notify(successful, failed)
+
+
+def process_new_pdfs(index):
+  # only PDFs whose size/mtime have settled; half-synced files wait for a later pass
+  for path in index.scan():
+    enqueue_job(path, Path(path).name)
+    metrics.pdfs_seen.inc()
+  return run_pipeline(due_jobs(), COMPLETED_FOLDER, ISSUE_FOLDER)
+
+def _next_wake(index):
+  """Seconds until a settling PDF or a retry is due, or None."""
+  waits = [index.next_due()]
+  retry_at = next_job_retry()
+  if retry_at is not None:
+    waits.append(max((retry_at - datetime.now()).total_seconds(), 0))
+  waits = [w for w in waits if w is not None]
+  return min(waits) if waits else None
+
+def _register_gauges(index):
+  metrics.register_gauge(
+    "itochu_jobs", "Unfinished jobs by state (queue depth)",
+    lambda: {(state,): n for state, n in job_state_counts().items()}, ("state",),
+  )
+  metrics.register_gauge("itochu_pdfs_settling", "PDFs in the watch folder waiting to settle", index.pending)
+
+  def oldest_waiting_age():
+    # oldest of: a PDF still settling, a job not finished yet
+    starts = [index.oldest_pending()]
+    created = oldest_unfinished_job()
+    if created is not None:
+      starts.append(created.timestamp())
+    starts = [s for s in starts if s is not None]
+    return max(time.time() - min(starts), 0) if starts else 0
+
+  metrics.register_gauge("itochu_oldest_waiting_pdf_age_seconds", "Age of the oldest PDF not yet processed", oldest_waiting_age)
 
 def main():
   init_db()
-  print(f"Watching folder: {WATCH_FOLDER}")
-  while True:
-    print("Checking for new PDF fiels...")
-    successful, failed = process_new_pdfs()
-    send_summary_email(successful, failed)
-    print("Sleeping after 5 minutes")
-    time.sleep(5 * 60)
+  requeued, interrupted = recover_jobs()
+  if requeued or interrupted:
+    print(f"Resuming after restart: {requeued} extraction(s) requeued, {interrupted} interrupted submission(s) sent to issue/")
+  index = DirectoryIndex(WATCH_FOLDER)
+  _register_gauges(index)
+  metrics.start_exporters()
+  profiling.start_control()
+  try:
+    with FolderWatcher(WATCH_FOLDER) as watcher:
+      print(f"Watching folder: {WATCH_FOLDER} ({watcher.backend.name})")
+      for reason, names in watcher.batches():
+        print(f"Checking for new PDF files ({reason}{': ' + ', '.join(sorted(names)) if names else ''})...")
+        successful, failed = process_new_pdfs(index)
+        send_summary_email(successful, failed)
+        due = _next_wake(index)
+        if due is not None:
+          print(f"Settling or retrying PDFs; checking again in {due:.0f}s")
+          watcher.wake_in(due)
+  finally:
+    if notifier is not None:
+      notifier.close(timeout=60)  # flush the pending digest on the way out
 
 
 if __name__ == "__main__":
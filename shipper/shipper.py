@@ -1,14 +1,14 @@
 from playwright.sync_api import sync_playwright
-from shipper.utils import get_latest_shipment
+from shipper.utils import get_latest_shipment, get_shipment
 from .login import login_if_needed
 from .receive_consignments import click_receive_consignments, get_highest_rcn_reference, click_new_receive_consignments
 from .fill_form import fill_new_shipment_form
 
 TEST_URL = "https://www-kiltst.wisegrid.net/Portals/TWD/Desktop#"
 
-def run_shipper_flow():
+def run_shipper_flow(shipment_id=None):
 
-  shipment = get_latest_shipment()
+  shipment = get_shipment(shipment_id) if shipment_id is not None else get_latest_shipment()
   if not shipment:
     print("No unprocessed shipments in database.")
     return None, None
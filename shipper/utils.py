@@ -9,12 +9,14 @@ def get_unprocessed_shipments():
   finally: 
     db.close()
 
-def mark_shipment_processed(shipment_id):
+def mark_shipment_processed(shipment_id, rcn_number=None, rc_num=None):
   db = SessionLocal()
   try:
     entry = db.query(ShipmentExtract).filter_by(id=shipment_id).first()
     if entry:
       entry.processed = 1
+      entry.rcn_number = None if rcn_number is None else str(rcn_number)
+      entry.rc_num = None if rc_num is None else str(rc_num)
       db.commit()
   finally:
     db.close()
@@ -25,4 +27,11 @@ def get_latest_shipment():
     return db.query(ShipmentExtract).order_by(ShipmentExtract.id.desc()).first()
   finally:
     db.close()
-    
\ No newline at end of file
+    
+
+def get_shipment(shipment_id):
+  db = SessionLocal()
+  try:
+    return db.query(ShipmentExtract).filter_by(id=shipment_id).first()
+  finally:
+    db.close()
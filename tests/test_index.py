@@ -0,0 +1,55 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import database.utils
+from database.models import Base, ProcessingJob
+from database.utils import enqueue_job
+from watcher.index import DirectoryIndex
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'auto.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)
+    monkeypatch.setattr(database.utils, "SessionLocal", session)
+    yield session
+    engine.dispose()
+
+
+def _finish(session, job_id):
+    with session() as s:
+        s.get(ProcessingJob, job_id).finished_at = datetime.now()
+        s.commit()
+
+
+def test_restart_keeps_admissions_that_reached_a_job(db, tmp_path):
+    folder = tmp_path / "in"
+    folder.mkdir()
+    for name in ("done.pdf", "queued.pdf", "lost.pdf"):
+        (folder / name).write_bytes(b"%PDF-1.4")
+
+    index = DirectoryIndex(str(folder), settle=0)
+    assert sorted(index.scan()) == sorted(str(folder / n) for n in ("done.pdf", "lost.pdf", "queued.pdf"))
+    _finish(db, enqueue_job(str(folder / "done.pdf"), "done.pdf"))  # finished, but the move failed
+    enqueue_job(str(folder / "queued.pdf"), "queued.pdf")
+    # lost.pdf: the run stopped before it was enqueued
+
+    restarted = DirectoryIndex(str(folder), settle=0)
+    assert restarted.scan() == [str(folder / "lost.pdf")]
+    assert restarted.scan() == []
+
+
+def test_changed_file_is_admitted_again_after_restart(db, tmp_path):
+    folder = tmp_path / "in"
+    folder.mkdir()
+    pdf = folder / "a.pdf"
+    pdf.write_bytes(b"%PDF-1.4")
+    assert DirectoryIndex(str(folder), settle=0).scan() == [str(pdf)]
+    _finish(db, enqueue_job(str(pdf), "a.pdf"))
+
+    pdf.write_bytes(b"%PDF-1.4 replaced")
+    assert DirectoryIndex(str(folder), settle=0).scan() == [str(pdf)]
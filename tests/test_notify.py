@@ -0,0 +1,114 @@
+import socketserver
+import threading
+import time
+from email import message_from_bytes
+from email.message import EmailMessage
+
+import pytest
+
+from watcher.notify import SummaryDispatcher
+
+
+class _SmtpStub(socketserver.ThreadingTCPServer):
+    """Just enough SMTP for smtplib: keeps each message's body and counts connections."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SmtpHandler)
+        self.messages: list[tuple[float, str]] = []
+        self.connections = 0
+        self.received = threading.Condition()
+
+    def wait_for(self, count: int, timeout: float) -> bool:
+        with self.received:
+            return self.received.wait_for(lambda: len(self.messages) >= count, timeout)
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line: str) -> None:
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.server.connections += 1
+        self._reply("220 stub ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            verb = line.decode().strip().split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self._reply("250 stub")
+            elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 end with <CRLF>.<CRLF>")
+                data = []
+                while (chunk := self.rfile.readline()) not in (b".\r\n", b""):
+                    data.append(chunk)
+                body = message_from_bytes(b"".join(data)).get_payload(decode=True).decode()
+                with self.server.received:
+                    self.server.messages.append((time.monotonic(), body))
+                    self.server.received.notify_all()
+                self._reply("250 queued")
+            elif verb == "QUIT":
+                self._reply("221 bye")
+                return
+            else:
+                self._reply("502 not implemented")
+
+
+def _render(successful: list, failed: list) -> EmailMessage:
+    msg = EmailMessage()
+    msg["Subject"] = "Batch summary"
+    msg["From"] = "watcher@example.com"
+    msg["To"] = "ops@example.com"
+    msg.set_content(f"ok: {','.join(successful)}\nfailed: {','.join(failed)}\n")
+    return msg
+
+
+@pytest.fixture
+def smtp():
+    server = _SmtpStub()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_first_email_immediate_then_digest(smtp):
+    port = smtp.server_address[1]
+    dispatcher = SummaryDispatcher(_render, None, None, host="127.0.0.1", port=port, starttls=False,
+                                   timeout=5, retries=1, digest=1.0, idle=30)
+    try:
+        started = time.monotonic()
+        dispatcher.notify(["a.pdf"], [])
+        assert smtp.wait_for(1, timeout=2)
+        assert smtp.messages[0][0] - started < 0.5
+        assert "ok: a.pdf" in smtp.messages[0][1]
+
+        dispatcher.notify(["b.pdf"], [])
+        dispatcher.notify([], ["c.pdf"])
+        assert not smtp.wait_for(2, timeout=0.5)  # still inside the digest window
+        assert smtp.wait_for(2, timeout=2)
+        sent_at, body = smtp.messages[1]
+        assert sent_at - smtp.messages[0][0] >= 0.9
+        assert "ok: b.pdf" in body and "failed: c.pdf" in body
+    finally:
+        dispatcher.close(timeout=5)
+    assert len(smtp.messages) == 2
+    assert smtp.connections == 1  # the connection was reused for the digest
+
+
+def test_close_sends_pending_digest_at_once(smtp):
+    port = smtp.server_address[1]
+    dispatcher = SummaryDispatcher(_render, None, None, host="127.0.0.1", port=port, starttls=False,
+                                   timeout=5, retries=1, digest=60, idle=30)
+    dispatcher.notify(["a.pdf"], [])
+    assert smtp.wait_for(1, timeout=2)
+    dispatcher.notify(["b.pdf"], [])
+    dispatcher.close(timeout=5)
+    assert smtp.wait_for(2, timeout=2)
+    assert "ok: b.pdf" in smtp.messages[1][1]
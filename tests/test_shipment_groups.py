@@ -0,0 +1,64 @@
+import contextlib
+import io
+import random
+
+import fitz
+import pytest
+
+from benchmarks.corpus import _add_text_page, _filler_lines, _shipment
+from extractor.extractor import PAGE_LABEL, PAGE_TSA, _shipment_groups, extract_pdf_records
+
+TSA, LABEL = PAGE_TSA, PAGE_LABEL
+
+
+def test_tsa_first_bundle_groups_by_position():
+    keys = [(TSA, "PHCDT1"), (LABEL, ""), ("", ""), (TSA, "PHCDT2"), (LABEL, "")]
+    assert _shipment_groups(keys) == [[0, 1, 2], [3, 4]]
+
+
+def test_label_first_bundle_with_references():
+    keys = [(LABEL, "PHCDT1"), (TSA, "PHCDT1"), (LABEL, "PHCDT2"), (TSA, "PHCDT2"), (LABEL, "PHCDT3"), (TSA, "PHCDT3")]
+    assert _shipment_groups(keys) == [[0, 1], [2, 3], [4, 5]]
+
+
+def test_label_first_bundle_without_references_joins_following_tsa():
+    keys = [(LABEL, ""), (TSA, "PHCDT1"), ("", ""), (LABEL, ""), (TSA, "PHCDT2"), (LABEL, ""), (TSA, "PHCDT3")]
+    assert _shipment_groups(keys) == [[0, 1, 2], [3, 4], [5, 6]]
+
+
+def test_reference_beats_position():
+    keys = [(TSA, "PHCDT1"), (TSA, "PHCDT2"), (LABEL, "PHCDT1"), (LABEL, "PHCDT2")]
+    assert _shipment_groups(keys) == [[0, 2], [1, 3]]
+
+
+def test_single_tsa_is_one_group():
+    assert _shipment_groups([(LABEL, ""), (TSA, "PHCDT1"), ("", "")]) == [[0, 1, 2]]
+
+
+def _label_first_bundle(path, with_refs: bool) -> list[dict]:
+    rng = random.Random(3)
+    doc = fitz.open()
+    expected = []
+    for _ in range(3):
+        tsa, label, fields = _shipment("bundle", rng)
+        if not with_refs:
+            label = [ln for ln in label if not ln.startswith("REF:")]
+        _add_text_page(doc, label)
+        _add_text_page(doc, tsa)
+        _add_text_page(doc, _filler_lines(rng))
+        expected.append(fields)
+    doc.save(str(path))
+    doc.close()
+    return expected
+
+
+@pytest.mark.parametrize("with_refs", [True, False])
+@pytest.mark.parametrize("streaming", [True, False])
+def test_label_first_bundle_keeps_each_tracking_number(tmp_path, with_refs, streaming):
+    path = tmp_path / "label-first.pdf"
+    expected = _label_first_bundle(path, with_refs)
+    with contextlib.redirect_stdout(io.StringIO()):
+        records = extract_pdf_records(str(path), streaming=streaming)
+    assert [(r["reference_no"], r["tracking_number"]) for r in records] == [
+        (e["reference_no"], e["tracking_number"]) for e in expected
+    ]
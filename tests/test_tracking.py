@@ -0,0 +1,137 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.corpus import fedex_number, ups_number
+from extractor import extractor
+from extractor.extractor import (
+    _best_tracking,
+    _ExtractStats,
+    _fedex_check_ok,
+    _ocr_pages_for_tracking_parallel,
+    _pick_ocr_tracking,
+    _tracking_check_ok,
+    _tracking_from_ocr_text,
+    _ups_check_ok,
+)
+
+UPS_VALID = "1Z999AA10123456784"
+FEDEX_VALID = "881752497440"  # PHCDT-14416353 AND FX LABEL.pdf
+
+
+@pytest.mark.parametrize("number", [UPS_VALID, "1ZJ221410310474033"])
+def test_ups_check_digit_valid(number):
+    assert _ups_check_ok(number)
+
+
+@pytest.mark.parametrize("number", [
+    "1Z999AA10123456785",   # wrong check digit
+    "1Z999AA10123456794",   # transposed digits
+    "1Z999AA1012345678",    # too short
+    "1Z999AA101234567844",  # too long
+    "2Z999AA10123456784",   # not a 1Z number
+    "1Z999AA1012345678A",   # letter as check digit
+])
+def test_ups_check_digit_invalid(number):
+    assert not _ups_check_ok(number)
+
+
+def test_fedex_check_digit_valid():
+    assert _fedex_check_ok(FEDEX_VALID)
+
+
+@pytest.mark.parametrize("number", [
+    "881752497441",   # wrong check digit
+    "881752479440",   # transposed digits
+    "88175249744",    # 11 digits
+    "8817524974400",  # 13 digits
+    "88175249744O",   # OCR'd O for 0
+])
+def test_fedex_check_digit_invalid(number):
+    assert not _fedex_check_ok(number)
+
+
+def test_tracking_check_accepts_readable_forms():
+    assert _tracking_check_ok("8817 5249 7440")
+    assert _tracking_check_ok("1z999aa10123456784")
+    assert not _tracking_check_ok("8817 5249 7441")
+
+
+def test_generated_numbers_validate_and_single_digit_errors_do_not():
+    rng = random.Random(0)
+    for number in [ups_number(rng) for _ in range(50)] + [fedex_number(rng) for _ in range(50)]:
+        assert _tracking_check_ok(number), number
+        wrong = number[:-1] + str((int(number[-1]) + 1) % 10)
+        assert not _tracking_check_ok(wrong), wrong
+
+
+def test_best_tracking_prefers_valid_label_hit():
+    assert _best_tracking(["881752497441", "8817 5249 7440"], [UPS_VALID]) == ("8817 5249 7440", True)
+
+
+def test_best_tracking_valid_anywhere_beats_invalid_label():
+    assert _best_tracking(["881752497441"], ["1Z999AA10123456785", UPS_VALID]) == (UPS_VALID, True)
+
+
+def test_best_tracking_falls_back_to_first_label_hit():
+    assert _best_tracking(["881752497441", "1Z999AA10123456785"], ["881752497442"]) == ("881752497441", False)
+
+
+def test_best_tracking_nothing_found():
+    assert _best_tracking([], ["1Z999AA10123456785"]) == ("", False)
+
+
+def test_ocr_text_rejects_unverified_fedex_shape_off_label():
+    assert _tracking_from_ocr_text("PACKING LIST\nPHONE 881752497441\n") == ""
+
+
+def test_ocr_text_accepts_valid_number_off_label():
+    assert _tracking_from_ocr_text("PACKING LIST\nREF 881752497440\n") == "8817 5249 7440"
+
+
+def test_ocr_text_keeps_unverified_ups_shape_off_label():
+    assert _tracking_from_ocr_text("SHIPPER COPY 1Z999AA10123456785\n") == "1Z999AA10123456785"
+
+
+def test_ocr_text_keeps_unverified_label_hit():
+    assert _tracking_from_ocr_text("TRACKING #: 881752497441\n") == "8817 5249 7441"
+
+
+def test_ocr_pick_waits_for_earlier_pages():
+    assert _pick_ocr_tracking({3: UPS_VALID}, 6) is None
+    assert _pick_ocr_tracking({0: "", 1: "", 2: "", 3: UPS_VALID}, 6) == UPS_VALID
+
+
+def test_ocr_pick_weak_hit_verify_window_ends_search(monkeypatch):
+    monkeypatch.setattr(extractor, "TRACKING_OCR_VERIFY_PAGES", 2)
+    weak = "881752497441"
+    assert _pick_ocr_tracking({0: weak, 1: ""}, 6) is None
+    assert _pick_ocr_tracking({0: weak, 1: "", 2: ""}, 6) == weak
+    assert _pick_ocr_tracking({0: weak, 1: "", 2: "", 3: UPS_VALID}, 6) == weak
+    assert _pick_ocr_tracking({0: weak, 1: "", 2: UPS_VALID}, 6) == UPS_VALID
+
+
+def test_ocr_pick_nothing_found():
+    assert _pick_ocr_tracking({0: "", 1: ""}, 2) == ""
+
+
+def test_parallel_ocr_matches_serial_rule_when_later_page_finishes_first(monkeypatch):
+    # page 0: weak hit, slow; page 4 (outside its verify window): valid, fast
+    hits = {0: (0.2, "881752497441"), 4: (0.0, UPS_VALID)}
+
+    def worker(pdf_path, page_index):
+        delay, trk = hits.get(page_index, (0.05, ""))
+        time.sleep(delay)
+        return trk
+
+    monkeypatch.setattr(extractor, "TRACKING_OCR_VERIFY_PAGES", 2)
+    monkeypatch.setattr(extractor, "_ocr_tracking_worker", worker)
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        monkeypatch.setattr(extractor, "_get_ocr_pool", lambda: pool)
+        doc = SimpleNamespace(name="bundle.pdf")
+        assert _ocr_pages_for_tracking_parallel(doc, list(range(6)), _ExtractStats()) == "881752497441"
+        hits[2] = (0.0, FEDEX_VALID)  # ...but a valid hit inside the window wins
+        assert _ocr_pages_for_tracking_parallel(doc, list(range(6)), _ExtractStats()) == FEDEX_VALID
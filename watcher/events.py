@@ -0,0 +1,228 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from typing import Iterator, Optional
+
+# auto: inotify on Linux, stat polling elsewhere
+# inotify / poll: force one; use poll for OneDrive/SMB/NFS folders changed from another machine
+WATCH_MODE = os.getenv("ITOCHU_WATCH_MODE", "auto").lower()
+# Quiet period after the last change before a batch is handed over (a copy in progress keeps resetting it)
+WATCH_DEBOUNCE_SECONDS = float(os.getenv("ITOCHU_WATCH_DEBOUNCE_SECONDS", "2"))
+# ...but a folder that never goes quiet is still handed over after this long
+WATCH_MAX_DELAY_SECONDS = float(os.getenv("ITOCHU_WATCH_MAX_DELAY_SECONDS", "30"))
+# How often the poller re-reads the folder
+WATCH_POLL_SECONDS = float(os.getenv("ITOCHU_WATCH_POLL_SECONDS", "2"))
+# Full pass over the folder even without events (missed events, retries, files that settled later)
+WATCH_RESCAN_SECONDS = float(os.getenv("ITOCHU_WATCH_RESCAN_SECONDS", "300"))
+
+def _is_pdf(name: str) -> bool:
+  return name.lower().endswith(".pdf")
+
+# ---------------------- inotify (Linux) ----------------------
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len; followed by `len` bytes of name
+_RESCAN = object()
+
+class InotifyBackend:
+  """Kernel change notifications for one directory (not recursive) via libc, no extra packages."""
+
+  name = "inotify"
+  _MASK = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_MODIFY | _IN_ATTRIB | _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_ONLYDIR
+
+  def __init__(self, folder: str):
+    if not sys.platform.startswith("linux"):
+      raise OSError("inotify is Linux-only")
+    self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    self._fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+    if self._fd < 0:
+      raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+    wd = self._libc.inotify_add_watch(self._fd, os.fsencode(folder), self._MASK)
+    if wd < 0:
+      err = ctypes.get_errno()
+      os.close(self._fd)
+      raise OSError(err, f"inotify_add_watch failed for {folder}")
+
+  def wait(self, timeout: float):
+    """PDF names touched within `timeout` seconds, or _RESCAN if the kernel queue overflowed."""
+    ready, _, _ = select.select([self._fd], [], [], max(timeout, 0))
+    if not ready:
+      return set()
+    try:
+      buf = os.read(self._fd, 64 * 1024)
+    except BlockingIOError:
+      return set()
+    names, pos = set(), 0
+    while pos + _EVENT_HEADER.size <= len(buf):
+      _, mask, _, length = _EVENT_HEADER.unpack_from(buf, pos)
+      pos += _EVENT_HEADER.size
+      name = os.fsdecode(buf[pos:pos + length].rstrip(b"\0"))
+      pos += length
+      if mask & (_IN_DELETE_SELF | _IN_MOVE_SELF | _IN_IGNORED):
+        raise OSError("watched folder was removed or moved")
+      if mask & _IN_Q_OVERFLOW:
+        return _RESCAN
+      if name and _is_pdf(name):
+        names.add(name)
+    return names
+
+  def close(self) -> None:
+    os.close(self._fd)
+
+# ---------------------- stat polling (any OS / synced folders) ----------------------
+class PollBackend:
+  """
+  Re-reads the directory every WATCH_POLL_SECONDS with one scandir (no per-file stat call on
+  Windows) and reports PDFs that are new or whose size / mtime / inode changed.
+  """
+
+  name = "poll"
+
+  def __init__(self, folder: str, interval: float = WATCH_POLL_SECONDS):
+    self.folder = folder
+    self.interval = interval
+    self._snapshot = self._scan()
+    self._next = time.monotonic() + interval
+
+  def _scan(self) -> dict[str, tuple[int, int, int]]:
+    snap = {}
+    with os.scandir(self.folder) as it:
+      for entry in it:
+        if not _is_pdf(entry.name):
+          continue
+        try:
+          if not entry.is_file():
+            continue
+          st = entry.stat()
+        except OSError:  # vanished between listing and stat
+          continue
+        snap[entry.name] = (st.st_size, st.st_mtime_ns, st.st_ino)
+    return snap
+
+  def wait(self, timeout: float):
+    delay = self._next - time.monotonic()
+    if delay > timeout:
+      time.sleep(max(timeout, 0))
+      return set()
+    time.sleep(max(delay, 0))
+    self._next = time.monotonic() + self.interval
+    snap = self._scan()
+    names = {name for name, sig in snap.items() if self._snapshot.get(name) != sig}
+    self._snapshot = snap
+    return names
+
+  def close(self) -> None:
+    pass
+
+_BACKENDS = {"inotify": InotifyBackend, "poll": PollBackend}
+
+def open_backend(folder: str, mode: str = WATCH_MODE):
+  names = ["inotify", "poll"] if mode == "auto" else [mode]
+  errors = []
+  for name in names:
+    factory = _BACKENDS.get(name)
+    if factory is None:
+      errors.append(f"unknown watch mode '{name}'")
+      continue
+    try:
+      return factory(folder)
+    except Exception as e:
+      errors.append(f"{name}: {e}")
+  raise RuntimeError("no folder watcher available: " + "; ".join(errors))
+
+# ---------------------- Debounced batches ----------------------
+class FolderWatcher:
+  """
+  Yields (reason, pdf_names) whenever the folder should be processed:
+    "startup" - once, straight away
+    "change"  - PDFs were added or rewritten and the folder has been quiet for the debounce period
+    "rescan"  - nothing happened for WATCH_RESCAN_SECONDS, or events were lost (pdf_names empty)
+    "settle"  - the time asked for with wake_in() has come (pdf_names empty)
+  A backend that breaks (folder removed, network share dropped) falls back to polling.
+  """
+
+  def __init__(self, folder: str, mode: str = WATCH_MODE, debounce: float = WATCH_DEBOUNCE_SECONDS,
+               max_delay: float = WATCH_MAX_DELAY_SECONDS, rescan: float = WATCH_RESCAN_SECONDS):
+    self.folder = folder
+    self.debounce = debounce
+    self.max_delay = max_delay
+    self.rescan = rescan
+    self.backend = open_backend(folder, mode)
+    self._wake_at: Optional[float] = None
+
+  def wake_in(self, seconds: float) -> None:
+    """Ask for a pass after `seconds` even if nothing changes (e.g. files still settling)."""
+    at = time.monotonic() + seconds
+    self._wake_at = at if self._wake_at is None else min(self._wake_at, at)
+
+  def _wait(self, timeout: float):
+    try:
+      return self.backend.wait(timeout)
+    except OSError as e:
+      print(f"[watcher] {self.backend.name} watch failed ({e}); polling {self.folder}")
+      self.backend.close()
+      while True:
+        try:
+          self.backend = PollBackend(self.folder)
+          return _RESCAN
+        except OSError:
+          time.sleep(WATCH_POLL_SECONDS)  # folder still unreachable
+
+  def batches(self) -> Iterator[tuple[str, set[str]]]:
+    yield "startup", set()
+    last_pass = time.monotonic()
+    while True:
+      deadline = last_pass + self.rescan
+      if self._wake_at is not None:
+        deadline = min(deadline, self._wake_at)
+      got = self._wait(max(deadline - time.monotonic(), 0))
+      if got is _RESCAN or (not got and time.monotonic() - last_pass >= self.rescan):
+        yield "rescan", set()
+        self._wake_at, last_pass = None, time.monotonic()
+        continue
+      if not got:
+        if self._wake_at is not None and time.monotonic() >= self._wake_at:
+          self._wake_at = None
+          yield "settle", set()
+          last_pass = time.monotonic()
+        continue
+
+      # debounce: keep collecting until the folder has been quiet for `debounce` seconds
+      names, first = set(got), time.monotonic()
+      lost = False
+      while time.monotonic() - first < self.max_delay:
+        quiet = max(self.debounce, getattr(self.backend, "interval", 0))  # a poller needs one clean scan
+        more = self._wait(min(quiet, first + self.max_delay - time.monotonic()))
+        if more is _RESCAN:
+          lost = True
+          break
+        if not more:
+          break
+        names |= more
+      self._wake_at = None  # this pass sees everything a pending wake-up would
+      yield ("rescan", set()) if lost else ("change", names)
+      last_pass = time.monotonic()
+
+  def close(self) -> None:
+    self.backend.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
@@ -0,0 +1,92 @@
+import os
+import time
+from datetime import datetime
+from typing import Optional
+
+from database.utils import latest_job_times, load_watched_files, save_watched_files
+
+# A PDF is admitted once its size, mtime and inode have not changed for this long
+# (OneDrive/SMB copies land in pieces and keep the source's mtime, so age alone proves nothing)
+SETTLE_SECONDS = float(os.getenv("ITOCHU_SETTLE_SECONDS", "10"))
+
+class DirectoryIndex:
+  """
+  Persistent (path → size, mtime, inode) index of the PDFs directly inside one folder.
+  scan() costs one directory listing; only new, changed and vanished entries are written back,
+  and a file is returned once, after it has stayed unchanged for SETTLE_SECONDS. A file that
+  changes after it was admitted settles and is admitted again.
+  """
+
+  def __init__(self, folder: str, settle: float = SETTLE_SECONDS):
+    self.folder = str(folder)
+    self.settle = settle
+    self._entries = load_watched_files(self.folder)
+    # Admitted before a restart: the admission stands once a job was created for it (a finished
+    # job whose file could not be moved must not run again). Without one, the run stopped
+    # between scan() and enqueueing, so offer the file again.
+    admitted = [p for p, e in self._entries.items() if e["admitted_at"] is not None]
+    jobs = latest_job_times(admitted) if admitted else {}
+    for path in admitted:
+      entry = self._entries[path]
+      created = jobs.get(path)
+      if created is None or created < datetime.fromtimestamp(entry["admitted_at"]):
+        entry["admitted_at"] = None
+
+  def _listing(self) -> dict[str, tuple[int, int, int]]:
+    found = {}
+    with os.scandir(self.folder) as it:
+      for entry in it:
+        if not entry.name.lower().endswith(".pdf"):
+          continue
+        try:
+          if not entry.is_file():
+            continue
+          st = entry.stat()
+        except OSError:  # vanished between listing and stat
+          continue
+        found[entry.path] = (st.st_size, st.st_mtime_ns, st.st_ino)
+    return found
+
+  def scan(self) -> list[str]:
+    """Paths of settled PDFs not handed out yet (oldest first), marked admitted."""
+    now = time.time()
+    listing = self._listing()
+    changed = {}
+    for path, (size, mtime_ns, inode) in listing.items():
+      entry = self._entries.get(path)
+      if entry is None or (entry["size"], entry["mtime_ns"], entry["inode"]) != (size, mtime_ns, inode):
+        entry = {"size": size, "mtime_ns": mtime_ns, "inode": inode, "stable_since": now, "admitted_at": None}
+        self._entries[path] = changed[path] = entry
+
+    ready = []
+    for path in listing:
+      entry = self._entries[path]
+      if entry["admitted_at"] is None and entry["size"] > 0 and now - entry["stable_since"] >= self.settle:
+        entry["admitted_at"] = now
+        changed[path] = entry
+        ready.append(path)
+    ready.sort(key=lambda p: (self._entries[p]["stable_since"], p))
+
+    removed = [p for p in self._entries if p not in listing]
+    for path in removed:
+      del self._entries[path]
+    if changed or removed:
+      save_watched_files(self.folder, changed, removed)
+    return ready
+
+  def next_due(self) -> Optional[float]:
+    """Seconds until the next settling file can be admitted (None if nothing is settling)."""
+    waits = [
+      e["stable_since"] + self.settle - time.time()
+      for e in self._entries.values() if e["admitted_at"] is None and e["size"] > 0
+    ]
+    return max(min(waits), 0) if waits else None
+
+  def oldest_pending(self) -> Optional[float]:
+    """Epoch seconds the longest-settling PDF was first seen unchanged, or None."""
+    since = [e["stable_since"] for e in list(self._entries.values()) if e["admitted_at"] is None]  # read by the metrics thread
+    return min(since) if since else None
+
+  def pending(self) -> int:
+    """PDFs in the folder still waiting to settle."""
+    return sum(1 for e in list(self._entries.values()) if e["admitted_at"] is None)
@@ -0,0 +1,200 @@
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+# Prometheus text endpoint: http://METRICS_HOST:METRICS_PORT/metrics ("0" = off)
+METRICS_HOST = os.getenv("ITOCHU_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("ITOCHU_METRICS_PORT", "9464") or 0)
+# Same text rewritten every METRICS_FILE_SECONDS (e.g. for node_exporter's textfile collector); "" = off
+METRICS_FILE = os.getenv("ITOCHU_METRICS_FILE", "")
+METRICS_FILE_SECONDS = float(os.getenv("ITOCHU_METRICS_FILE_SECONDS", "15"))
+
+# Latency buckets in seconds: sub-second DB writes up to multi-minute portal sessions
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+PAGE_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100)
+
+def _labels(names: tuple, values: tuple) -> str:
+  if not names:
+    return ""
+  pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+  return "{" + pairs + "}"
+
+def _escape(value) -> str:
+  return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class _Metric(ABC):
+  kind = ""
+
+  def __init__(self, name: str, help: str, labelnames: tuple = ()):
+    self.name = name
+    self.help = help
+    self.labelnames = tuple(labelnames)
+    self._lock = threading.Lock()
+
+  def _key(self, labels: dict) -> tuple:
+    return tuple(labels.get(n, "") for n in self.labelnames)
+
+  def render(self) -> list[str]:
+    return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+  @abstractmethod
+  def _samples(self) -> list[str]:
+    ...
+
+class Counter(_Metric):
+  kind = "counter"
+
+  def __init__(self, name: str, help: str, labelnames: tuple = ()):
+    super().__init__(name, help, labelnames)
+    self._values: dict[tuple, float] = {} if labelnames else {(): 0.0}
+
+  def inc(self, amount: float = 1, **labels) -> None:
+    key = self._key(labels)
+    with self._lock:
+      self._values[key] = self._values.get(key, 0.0) + amount
+
+  def _samples(self) -> list[str]:
+    with self._lock:
+      return [f"{self.name}{_labels(self.labelnames, k)} {v:g}" for k, v in sorted(self._values.items())]
+
+class Gauge(_Metric):
+  """Value read at scrape time from `fn` ({label values: value} when labelled)."""
+
+  kind = "gauge"
+
+  def __init__(self, name: str, help: str, fn: Callable, labelnames: tuple = ()):
+    super().__init__(name, help, labelnames)
+    self.fn = fn
+
+  def _samples(self) -> list[str]:
+    try:
+      value = self.fn()
+    except Exception as e:
+      print(f"[metrics] {self.name}: {e}")
+      return []
+    if not self.labelnames:
+      return [] if value is None else [f"{self.name} {value:g}"]
+    return [f"{self.name}{_labels(self.labelnames, k)} {v:g}" for k, v in sorted(value.items())]
+
+class Histogram(_Metric):
+  kind = "histogram"
+
+  def __init__(self, name: str, help: str, buckets: tuple = SECONDS_BUCKETS, labelnames: tuple = ()):
+    super().__init__(name, help, labelnames)
+    self.buckets = tuple(sorted(buckets))
+    self._series: dict[tuple, list] = {}  # key -> [bucket counts..., sum, count]
+
+  def observe(self, value: float, **labels) -> None:
+    key = self._key(labels)
+    with self._lock:
+      series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+      for i, bound in enumerate(self.buckets):
+        if value <= bound:
+          series[i] += 1
+      series[-2] += value
+      series[-1] += 1
+
+  def time(self, **labels) -> "_Timer":
+    return _Timer(self, labels)
+
+  def _samples(self) -> list[str]:
+    out = []
+    with self._lock:
+      for key, series in sorted(self._series.items()):
+        names, values = self.labelnames + ("le",), key
+        for bound, n in zip(self.buckets, series):
+          out.append(f"{self.name}_bucket{_labels(names, values + (f'{bound:g}',))} {n}")
+        out.append(f"{self.name}_bucket{_labels(names, values + ('+Inf',))} {series[-1]}")
+        out.append(f"{self.name}_sum{_labels(self.labelnames, key)} {series[-2]:g}")
+        out.append(f"{self.name}_count{_labels(self.labelnames, key)} {series[-1]}")
+    return out
+
+class _Timer:
+  def __init__(self, histogram: Histogram, labels: dict):
+    self.histogram = histogram
+    self.labels = labels
+
+  def __enter__(self):
+    self.started = time.perf_counter()
+    return self
+
+  def __exit__(self, *exc):
+    self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+class Registry:
+  def __init__(self):
+    self._metrics: list[_Metric] = []
+
+  def register(self, metric: _Metric) -> _Metric:
+    self._metrics.append(metric)
+    return metric
+
+  def render(self) -> str:
+    lines = []
+    for metric in self._metrics:
+      lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+# ---------------------- Pipeline metrics ----------------------
+pdfs_seen = REGISTRY.register(Counter("itochu_pdfs_seen_total", "PDFs admitted from the watch folder"))
+pdfs_extracted = REGISTRY.register(Counter(
+  "itochu_pdfs_extracted_total", "PDFs extracted (source: extractor or a stored extraction)", ("source",)))
+pdfs_submitted = REGISTRY.register(Counter("itochu_pdfs_submitted_total", "PDFs whose shipments were all submitted"))
+pdfs_failed = REGISTRY.register(Counter("itochu_pdfs_failed_total", "PDFs moved to issue/, by failing stage", ("stage",)))
+job_retries = REGISTRY.register(Counter("itochu_job_retries_total", "Failed attempts scheduled for retry", ("stage",)))
+extract_seconds = REGISTRY.register(Histogram("itochu_extract_seconds", "extract_pdf_records wall time per PDF"))
+db_save_seconds = REGISTRY.register(Histogram("itochu_db_save_seconds", "Saving one PDF's shipments"))
+submit_seconds = REGISTRY.register(Histogram("itochu_submit_seconds", "run_shipper_flow per shipment"))
+end_to_end_seconds = REGISTRY.register(Histogram(
+  "itochu_end_to_end_seconds", "Job queued to PDF moved out of the watch folder", labelnames=("outcome",)))
+ocr_pages = REGISTRY.register(Histogram("itochu_ocr_pages", "Pages OCR'd per extracted PDF", PAGE_BUCKETS))
+
+def register_gauge(name: str, help: str, fn: Callable, labelnames: tuple = ()) -> Gauge:
+  return REGISTRY.register(Gauge(name, help, fn, labelnames))
+
+# ---------------------- Exporters ----------------------
+class _Handler(BaseHTTPRequestHandler):
+  def do_GET(self):
+    if self.path.split("?")[0] not in ("/metrics", "/"):
+      self.send_error(404)
+      return
+    body = REGISTRY.render().encode()
+    self.send_response(200)
+    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, *args):  # no per-scrape console noise
+    pass
+
+def _write_file_forever(path: str, every: float) -> None:
+  while True:
+    try:
+      tmp = f"{path}.tmp"
+      with open(tmp, "w", encoding="utf-8") as f:
+        f.write(REGISTRY.render())
+      os.replace(tmp, path)  # readers never see a half-written file
+    except Exception as e:
+      print(f"[metrics] could not write {path}: {e}")
+    time.sleep(every)
+
+def start_exporters(host: str = METRICS_HOST, port: int = METRICS_PORT, path: str = METRICS_FILE) -> Optional[ThreadingHTTPServer]:
+  """Start the HTTP endpoint and/or file writer on daemon threads; failures are reported, not raised."""
+  server = None
+  if port:
+    try:
+      server = ThreadingHTTPServer((host, port), _Handler)
+      threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+      print(f"Metrics on http://{host}:{server.server_port}/metrics")
+    except OSError as e:
+      print(f"[metrics] endpoint not started on {host}:{port}: {e}")
+      server = None
+  if path:
+    threading.Thread(target=_write_file_forever, args=(path, METRICS_FILE_SECONDS), name="metrics-file", daemon=True).start()
+  return server
@@ -0,0 +1,147 @@
+import os
+import queue
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+from typing import Callable, Optional
+
+SMTP_HOST = os.getenv("ITOCHU_SMTP_HOST", "smtp.office365.com")
+SMTP_PORT = int(os.getenv("ITOCHU_SMTP_PORT", "587"))
+# "0" for a plain local SMTP stand-in (no STARTTLS; login is skipped without EMAIL_USER/EMAIL_PASS)
+SMTP_STARTTLS = os.getenv("ITOCHU_SMTP_STARTTLS", "1") == "1"
+SMTP_TIMEOUT_SECONDS = float(os.getenv("ITOCHU_SMTP_TIMEOUT_SECONDS", "30"))
+# Send attempts per email; waits 2, 4, 8... seconds in between
+SMTP_RETRIES = int(os.getenv("ITOCHU_SMTP_RETRIES", "3"))
+# An idle SMTP connection is closed after this long (servers drop it anyway)
+SMTP_IDLE_SECONDS = float(os.getenv("ITOCHU_SMTP_IDLE_SECONDS", "60"))
+# At most one email per this many seconds; results arriving meanwhile go into the next one
+EMAIL_DIGEST_SECONDS = float(os.getenv("ITOCHU_EMAIL_DIGEST_SECONDS", "300"))
+
+# After every attempt of an email failed, wait at least this long before trying again
+_GIVE_UP_SECONDS = 60.0
+
+_STOP = object()
+
+class SummaryDispatcher:
+  """
+  Sends batch summaries from a background thread so SMTP never holds up processing.
+  notify() only queues; the thread merges everything that arrives within one digest window
+  into a single email (rendered by `render(successful, failed)`), reuses its SMTP connection,
+  and retries with backoff. An email that still fails is kept and merged into the next one.
+  """
+
+  def __init__(self, render: Callable[[list, list], EmailMessage], user: Optional[str], password: Optional[str],
+               host: str = SMTP_HOST, port: int = SMTP_PORT, starttls: bool = SMTP_STARTTLS,
+               timeout: float = SMTP_TIMEOUT_SECONDS, retries: int = SMTP_RETRIES,
+               digest: float = EMAIL_DIGEST_SECONDS, idle: float = SMTP_IDLE_SECONDS):
+    self.render = render
+    self.user = user
+    self.password = password
+    self.host = host
+    self.port = port
+    self.starttls = starttls
+    self.timeout = timeout
+    self.retries = max(retries, 1)
+    self.digest = digest
+    self.idle = idle
+    self._queue: queue.Queue = queue.Queue()
+    self._smtp: Optional[smtplib.SMTP] = None
+    self._last_used = 0.0
+    self._successful, self._failed = [], []
+    self._next_send = 0.0  # monotonic time the next email may go out
+    self._thread = threading.Thread(target=self._run, name="summary-email", daemon=True)
+    self._thread.start()
+
+  def notify(self, successful: list, failed: list) -> None:
+    if successful or failed:
+      self._queue.put((list(successful), list(failed)))
+
+  def close(self, timeout: Optional[float] = None) -> None:
+    """Send whatever is pending (ignoring the digest window) and stop the thread."""
+    self._queue.put(_STOP)
+    self._thread.join(timeout)
+
+  # ---------------------- background thread ----------------------
+  def _run(self) -> None:
+    stopping = False
+    while not stopping:
+      try:
+        item = self._queue.get(timeout=self._wait_seconds())
+      except queue.Empty:
+        item = None
+      while item is not None:
+        if item is _STOP:
+          stopping = True
+        else:
+          self._successful.extend(item[0])
+          self._failed.extend(item[1])
+        try:
+          item = self._queue.get_nowait()
+        except queue.Empty:
+          item = None
+      if (self._successful or self._failed) and (stopping or time.monotonic() >= self._next_send):
+        self._send_pending()
+      if self._smtp is not None and (stopping or time.monotonic() - self._last_used >= self.idle):
+        self._disconnect()
+
+  def _wait_seconds(self) -> Optional[float]:
+    """Until the digest window opens or the connection goes idle; None = nothing to do but wait."""
+    now = time.monotonic()
+    waits = []
+    if self._successful or self._failed:
+      waits.append(self._next_send - now)
+    if self._smtp is not None:
+      waits.append(self._last_used + self.idle - now)
+    return max(min(waits), 0.05) if waits else None
+
+  def _send_pending(self) -> None:
+    try:
+      msg = self.render(self._successful, self._failed)
+    except Exception as e:
+      print(f"Could not build summary email, dropping it: {e}")
+      self._successful, self._failed = [], []
+      return
+    for attempt in range(1, self.retries + 1):
+      try:
+        self._connection().send_message(msg)
+        self._last_used = time.monotonic()
+        print("Summary email sent.")
+        self._successful, self._failed = [], []
+        self._next_send = time.monotonic() + self.digest
+        return
+      except Exception as e:
+        print(f"Failed to send email (attempt {attempt}/{self.retries}): {e}")
+        self._disconnect()
+        if attempt < self.retries:
+          time.sleep(2 ** attempt)
+    # keep the results for the next window rather than losing them
+    self._next_send = time.monotonic() + max(self.digest, _GIVE_UP_SECONDS)
+
+  def _connection(self) -> smtplib.SMTP:
+    if self._smtp is not None:
+      try:
+        self._smtp.noop()
+        return self._smtp
+      except Exception:
+        self._disconnect()
+    smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+    try:
+      if self.starttls:
+        smtp.starttls()
+      if self.user and self.password:
+        smtp.login(self.user, self.password)
+    except Exception:
+      smtp.close()
+      raise
+    self._smtp = smtp
+    return smtp
+
+  def _disconnect(self) -> None:
+    smtp, self._smtp = self._smtp, None
+    if smtp is None:
+      return
+    try:
+      smtp.quit()
+    except Exception:
+      smtp.close()
@@ -0,0 +1,284 @@
+import multiprocessing
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Callable, Optional
+
+from extractor.extractor import extract_pdf_records, content_hash, EXTRACTOR_VERSION
+from database.utils import (
+  find_extractions, claim_job, update_job, save_job_shipments, job_shipments, job_submissions,
+  JOB_QUEUED, JOB_EXTRACTING, JOB_EXTRACTED, JOB_SUBMITTING, JOB_SUBMITTED, JOB_FAILED,
+)
+from shipper.utils import mark_shipment_processed
+from . import metrics, profiling
+
+# Concurrency per stage. extract > 1 runs extraction in that many worker processes;
+# submit > 1 opens that many portal browser sessions at once (keep 1 unless the portal copes).
+STAGE_WORKERS = {
+  "extract": int(os.getenv("ITOCHU_EXTRACT_WORKERS", "2")),
+  "persist": int(os.getenv("ITOCHU_PERSIST_WORKERS", "1")),
+  "submit": int(os.getenv("ITOCHU_SUBMIT_WORKERS", "1")),
+  "finalize": 1,
+}
+# Items allowed to wait between two stages; a full queue blocks the stage in front of it
+PIPELINE_QUEUE_SIZE = int(os.getenv("ITOCHU_PIPELINE_QUEUE_SIZE", "4"))
+# Claims of one stage before a job is failed; retries wait base * 2^(attempt-1) seconds, capped
+JOB_MAX_ATTEMPTS = int(os.getenv("ITOCHU_JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("ITOCHU_JOB_RETRY_BASE_SECONDS", "30"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("ITOCHU_JOB_RETRY_MAX_SECONDS", "1800"))
+
+_DONE = object()
+
+# State a failed claim falls back to for its retry
+_RETRY_STATE = {JOB_EXTRACTING: JOB_QUEUED, JOB_SUBMITTING: JOB_EXTRACTED}
+
+class PdfJob:
+  """
+  One processing_jobs row on its way through the stages. Each stage acts only on jobs in the
+  state it handles, so a job resumed at 'extracted' passes straight through to submission.
+  `error` set by any stage sends the job straight to finalize.
+  """
+
+  def __init__(self, row: dict):
+    self.id = row["id"]
+    self.path = Path(row["path"])
+    self.state = row["state"]
+    self.attempts = row["attempts"]
+    self.last_error = row["last_error"]
+    self.created_at: Optional[datetime] = row.get("created_at")
+    self.content_hash: Optional[str] = None
+    self.records: list[dict] = []
+    self.stats: dict = {}
+    self.reused = False
+    self.claimed = True                # False: another worker holds it, leave it alone
+    self.submitted: list[tuple] = []   # (label, data, rcn_number, rc_num)
+    self.error: Optional[Exception] = None
+    self.started = time.monotonic()
+
+  def claim(self, to_state: str) -> bool:
+    self.claimed = claim_job(self.id, self.state, to_state)
+    if self.claimed:
+      self.state, self.attempts = to_state, self.attempts + 1
+    return self.claimed
+
+  @property
+  def name(self) -> str:
+    return self.path.name
+
+# ---------------------- Extraction processes ----------------------
+_extract_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_extract_pool() -> ProcessPoolExecutor:
+  # kept across batches so workers keep their OCR engine / caches warm
+  global _extract_pool
+  if _extract_pool is None:
+    # spawn, not fork: forking this threaded daemon can copy a lock another thread holds (stdout,
+    # logging) into the worker, which then hangs on its first print. Same start method as Windows.
+    _extract_pool = ProcessPoolExecutor(max_workers=STAGE_WORKERS["extract"],
+                                        mp_context=multiprocessing.get_context("spawn"))
+  return _extract_pool
+
+def _reset_extract_pool() -> None:
+  global _extract_pool
+  pool, _extract_pool = _extract_pool, None
+  if pool is not None:
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _extract_worker(pdf_path: str, profile_path: Optional[str] = None) -> tuple[list[dict], dict]:
+  stats = {}
+  return profiling.run_profiled(profile_path, extract_pdf_records, pdf_path, stats=stats), stats
+
+# ---------------------- Stage steps ----------------------
+def _extract(job: PdfJob) -> None:
+  if job.state != JOB_QUEUED or not job.claim(JOB_EXTRACTING):
+    return
+  print(f"Processing {job.path}")
+  job.content_hash = content_hash(str(job.path))
+  job.records = find_extractions(job.content_hash, EXTRACTOR_VERSION)
+  if job.records:
+    job.reused = True
+    print(f"Reusing stored extraction for {job.name} (same content, extractor v{EXTRACTOR_VERSION})")
+    metrics.pdfs_extracted.inc(source="stored")
+    return
+  profile_path = profiling.worker_profile_path(job.name)  # set while a profile capture is running
+  with metrics.extract_seconds.time():
+    if STAGE_WORKERS["extract"] > 1:
+      try:
+        job.records, job.stats = _get_extract_pool().submit(_extract_worker, str(job.path), profile_path).result()
+      except BrokenProcessPool:
+        _reset_extract_pool()  # a worker died (crash / OOM); the next PDF gets a fresh pool
+        raise
+    else:
+      job.records, job.stats = _extract_worker(str(job.path), profile_path)
+  metrics.pdfs_extracted.inc(source="extractor")
+  metrics.ocr_pages.observe(job.stats.get("ocr_pages", 0))
+
+def _persist(job: PdfJob) -> None:
+  if job.state != JOB_EXTRACTING:
+    return
+  # A bundle of several consignments becomes one shipment (and one submission) per TSA group
+  with metrics.db_save_seconds.time():
+    save_job_shipments(job.id, job.records, filename=job.name, content_hash=job.content_hash,
+                       extractor_version=EXTRACTOR_VERSION)
+  job.state, job.attempts = JOB_EXTRACTED, 0
+
+def _submit(job: PdfJob) -> None:
+  if job.state != JOB_EXTRACTED or not job.claim(JOB_SUBMITTING):
+    return
+  # Playwright is only needed once there is a PDF to submit; keep watcher startup fast
+  from shipper.shipper import run_shipper_flow
+
+  # shipments already submitted by an earlier attempt are marked processed and skipped;
+  # each one's RC/RCN is stored with it so a retry can still report them
+  for shipment_id, data, record_no, record_count in job_shipments(job.id):
+    with metrics.submit_seconds.time():
+      rcn_number, rc_num = run_shipper_flow(shipment_id)
+    mark_shipment_processed(shipment_id, rcn_number, rc_num)
+  job.submitted = [
+    (job.name if record_count == 1 else f"{job.name} [{record_no + 1}/{record_count}]", data, rcn_number, rc_num)
+    for data, record_no, record_count, rcn_number, rc_num in job_submissions(job.id)
+  ]
+  update_job(job.id, state=JOB_SUBMITTED, attempts=0, next_attempt_at=None, last_error=None)
+  job.state = JOB_SUBMITTED
+
+def _retry_delay(attempts: int) -> float:
+  return min(JOB_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), JOB_RETRY_MAX_SECONDS)
+
+def _is_permanent(job: PdfJob) -> bool:
+  # a PDF missing required fields will fail the same way every time
+  return job.attempts >= JOB_MAX_ATTEMPTS or (job.state == JOB_EXTRACTING and isinstance(job.error, ValueError))
+
+class _Finalizer:
+  """
+  Settles each job: schedules a retry (the PDF stays put), or moves the PDF to completed/ or
+  issue/ and marks the job finished. Collects the batch summary.
+  """
+
+  def __init__(self, completed_folder: Path, issue_folder: Path):
+    self.completed_folder = completed_folder
+    self.issue_folder = issue_folder
+    self.successful, self.failed = [], []
+
+  def __call__(self, job: PdfJob) -> None:
+    if not job.claimed:
+      return
+    try:
+      self._settle(job)
+    finally:
+      profiling.pdf_done()
+
+  def _settle(self, job: PdfJob) -> None:
+    if job.error is not None:
+      if job.state not in _RETRY_STATE:  # failed before claiming anything; the next pass picks it up
+        print(f"[pipeline] {job.name}: {job.error}")
+        return
+      if not _is_permanent(job):
+        delay = _retry_delay(job.attempts)
+        update_job(job.id, state=_RETRY_STATE[job.state], last_error=str(job.error),
+                   next_attempt_at=datetime.now() + timedelta(seconds=delay))
+        print(f"Failed on {job.path} ({job.state}, attempt {job.attempts}/{JOB_MAX_ATTEMPTS}): {job.error}; retrying in {delay:.0f}s")
+        metrics.job_retries.inc(stage=job.state)
+        return
+      metrics.pdfs_failed.inc(stage=job.state)
+      job.state, job.last_error = JOB_FAILED, str(job.error)
+      update_job(job.id, state=JOB_FAILED, last_error=job.last_error)
+
+    if job.state == JOB_SUBMITTED:
+      shutil.move(str(job.path), self.completed_folder / job.name)
+      self.successful.extend(job.submitted)
+    elif job.state == JOB_FAILED:
+      print(f"Failed on {job.path}: {job.last_error}")
+      try:
+        shutil.move(str(job.path), self.issue_folder / job.name)
+      except Exception as e:
+        print(f"Could not move {job.name} to {self.issue_folder}: {e}")
+      self.failed.append(job.name)
+      if job.error is None:  # failed by restart recovery
+        metrics.pdfs_failed.inc(stage="recovery")
+    else:
+      return
+    finished = datetime.now()
+    update_job(job.id, finished_at=finished)
+    if job.state == JOB_SUBMITTED:
+      metrics.pdfs_submitted.inc()
+    if job.created_at is not None:
+      metrics.end_to_end_seconds.observe((finished - job.created_at).total_seconds(), outcome=job.state)
+
+# ---------------------- Stages ----------------------
+class _Stage:
+  """`workers` threads taking jobs from `inbox`, running `step`, handing them to `outbox`."""
+
+  def __init__(self, name: str, step: Callable[[PdfJob], None], workers: int,
+               inbox: queue.Queue, outbox: Optional[queue.Queue], always: bool = False):
+    self.name = name
+    self.step = step
+    self.inbox = inbox
+    self.outbox = outbox
+    self.always = always  # run even for jobs that already failed (finalize)
+    self.threads = [
+      threading.Thread(target=self._loop, name=f"pipeline-{name}-{i}", daemon=True)
+      for i in range(max(workers, 1))
+    ]
+    for t in self.threads:
+      t.start()
+
+  def _loop(self) -> None:
+    while True:
+      job = self.inbox.get()
+      if job is _DONE:
+        return
+      if job.error is None or self.always:
+        try:
+          self.step(job)
+        except Exception as e:
+          if job.error is None:
+            job.error = e
+          else:
+            print(f"[pipeline] {self.name} failed for {job.name}: {e}")
+      if self.outbox is not None:
+        self.outbox.put(job)  # blocks while the next stage is backed up
+
+  def close(self) -> None:
+    """Wait for every queued job to pass this stage."""
+    for _ in self.threads:
+      self.inbox.put(_DONE)
+    for t in self.threads:
+      t.join()
+
+# Queues of the run in progress, for the queue-depth gauge
+_active_queues: dict[str, queue.Queue] = {}
+
+metrics.register_gauge(
+  "itochu_pipeline_queue_depth", "Jobs waiting in front of each stage of the current run",
+  lambda: {(stage,): q.qsize() for stage, q in list(_active_queues.items())}, ("stage",),
+)
+
+def run_pipeline(jobs: list[dict], completed_folder: Path, issue_folder: Path) -> tuple[list, list]:
+  """
+  Push due jobs (database.utils.due_jobs()) through extract → persist → submit → finalize, each
+  stage with its own workers and a bounded queue in front of it, so the next PDF is extracted
+  while the current one is being submitted. Returns (successful, failed) for the summary email.
+  """
+  if not jobs:
+    return [], []
+  finalizer = _Finalizer(completed_folder, issue_folder)
+  queues = [queue.Queue(maxsize=PIPELINE_QUEUE_SIZE) for _ in range(4)]
+  _active_queues.update(zip(("extract", "persist", "submit", "finalize"), queues))
+  stages = [
+    _Stage("extract", _extract, STAGE_WORKERS["extract"], queues[0], queues[1]),
+    _Stage("persist", _persist, STAGE_WORKERS["persist"], queues[1], queues[2]),
+    _Stage("submit", _submit, STAGE_WORKERS["submit"], queues[2], queues[3]),
+    _Stage("finalize", finalizer, STAGE_WORKERS["finalize"], queues[3], None, always=True),
+  ]
+  for row in jobs:
+    queues[0].put(PdfJob(row))
+  for stage in stages:
+    stage.close()
+  _active_queues.clear()
+  return finalizer.successful, finalizer.failed
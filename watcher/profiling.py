@@ -0,0 +1,216 @@
+import cProfile
+import glob
+import io
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+# Touch this file to start a capture; its contents may say "pdfs=N" or "seconds=N". It is
+# removed once read. On POSIX, SIGUSR1 starts a capture too (and stops one that is running).
+PROFILE_CONTROL_FILE = os.getenv("ITOCHU_PROFILE_CONTROL_FILE", "./itochu_profile.ctl")
+PROFILE_DIR = os.getenv("ITOCHU_PROFILE_DIR", "./profiles")
+# Default capture length when the trigger doesn't say
+PROFILE_PDFS = int(os.getenv("ITOCHU_PROFILE_PDFS", "5"))
+PROFILE_MAX_SECONDS = float(os.getenv("ITOCHU_PROFILE_MAX_SECONDS", "600"))  # cap for a "pdfs=N" capture
+# Stack sampling period for the daemon's own threads
+PROFILE_SAMPLE_MS = float(os.getenv("ITOCHU_PROFILE_SAMPLE_MS", "10"))
+
+_CHECK_SECONDS = 1.0
+
+def _frame_label(frame) -> str:
+  code = frame.f_code
+  return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+def thread_stacks() -> str:
+  """Current stack of every thread in this process, innermost call last."""
+  names = {t.ident: t.name for t in threading.enumerate()}
+  out = []
+  for ident, frame in sys._current_frames().items():
+    out.append(f"--- thread {names.get(ident, ident)} ({ident})")
+    out.extend(line.rstrip("\n") for line in traceback.format_stack(frame))
+    out.append("")
+  return "\n".join(out)
+
+class _Sampler:
+  """Samples every thread's stack (sys._current_frames) on a timer; cheap enough to leave on for minutes."""
+
+  def __init__(self, interval: float):
+    self.interval = interval
+    self.stacks: Counter = Counter()
+    self.samples = 0
+    self._stop = threading.Event()
+    self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+    self._thread.start()
+
+  def _run(self) -> None:
+    while not self._stop.wait(self.interval):
+      names = {t.ident: t.name for t in threading.enumerate()}
+      for ident, frame in sys._current_frames().items():
+        if names.get(ident, "").startswith("profile-"):  # the profiler's own threads
+          continue
+        calls = []
+        while frame is not None:
+          calls.append(_frame_label(frame))
+          frame = frame.f_back
+        self.stacks[(names.get(ident, str(ident)), tuple(reversed(calls)))] += 1
+      self.samples += 1
+
+  def stop(self) -> None:
+    self._stop.set()
+    self._thread.join()
+
+  def report(self) -> tuple[str, str]:
+    """(collapsed stacks for flame graph tools, top functions by own and total samples)."""
+    collapsed = "\n".join(
+      f"{thread};{';'.join(calls)} {n}" for (thread, calls), n in self.stacks.most_common()
+    )
+    own, total = Counter(), Counter()
+    for (thread, calls), n in self.stacks.items():
+      if calls:
+        own[calls[-1]] += n
+      for call in set(calls):
+        total[call] += n
+    lines = [f"{self.samples} samples every {self.interval * 1000:.0f} ms", "", "own samples  function"]
+    lines += [f"{n:12d}  {call}" for call, n in own.most_common(40)]
+    lines += ["", "total samples  function"]
+    lines += [f"{n:14d}  {call}" for call, n in total.most_common(40)]
+    return collapsed + "\n", "\n".join(lines) + "\n"
+
+class ProfileCapture:
+  """
+  One capture: samples the daemon's threads while it runs, and extraction workers cProfile each
+  PDF into `out_dir`. Ends after `pdfs` finished PDFs or `seconds`, whichever is set / first.
+  """
+
+  def __init__(self, pdfs: Optional[int], seconds: Optional[float]):
+    self.pdfs = pdfs
+    self.deadline = time.monotonic() + (seconds if seconds else PROFILE_MAX_SECONDS)
+    self.done_pdfs = 0
+    self.out_dir = os.path.abspath(os.path.join(PROFILE_DIR, datetime.now().strftime("profile-%Y%m%d-%H%M%S")))
+    os.makedirs(self.out_dir, exist_ok=True)
+    with open(os.path.join(self.out_dir, "stacks-start.txt"), "w", encoding="utf-8") as f:
+      f.write(thread_stacks())
+    self.sampler = _Sampler(PROFILE_SAMPLE_MS / 1000)
+
+  def finished(self) -> bool:
+    return time.monotonic() >= self.deadline or (self.pdfs is not None and self.done_pdfs >= self.pdfs)
+
+  def dump(self) -> None:
+    self.sampler.stop()
+    collapsed, top = self.sampler.report()
+    with open(os.path.join(self.out_dir, "stacks-end.txt"), "w", encoding="utf-8") as f:
+      f.write(thread_stacks())
+    with open(os.path.join(self.out_dir, "daemon-collapsed.txt"), "w", encoding="utf-8") as f:
+      f.write(collapsed)
+    with open(os.path.join(self.out_dir, "daemon-top.txt"), "w", encoding="utf-8") as f:
+      f.write(top)
+    worker_profiles = sorted(glob.glob(os.path.join(self.out_dir, "extract-*.prof")))
+    if worker_profiles:
+      buf = io.StringIO()
+      pstats.Stats(*worker_profiles, stream=buf).sort_stats("cumulative").print_stats(60)
+      with open(os.path.join(self.out_dir, "extract-summary.txt"), "w", encoding="utf-8") as f:
+        f.write(buf.getvalue())
+    print(f"[profile] capture written to {self.out_dir} ({self.done_pdfs} PDF(s), {len(worker_profiles)} extraction profile(s))")
+
+# ---------------------- Control ----------------------
+_lock = threading.Lock()
+_capture: Optional[ProfileCapture] = None
+_signalled = threading.Event()
+
+def _parse_request(text: str) -> tuple[Optional[int], Optional[float]]:
+  pdfs, seconds = None, None
+  for part in text.replace(",", " ").split():
+    key, _, value = part.partition("=")
+    try:
+      if key.strip().lower() == "pdfs":
+        pdfs = int(value)
+      elif key.strip().lower() == "seconds":
+        seconds = float(value)
+    except ValueError:
+      print(f"[profile] ignoring '{part}' in {PROFILE_CONTROL_FILE}")
+  if pdfs is None and seconds is None:
+    pdfs = PROFILE_PDFS
+  return pdfs, seconds
+
+def start_capture(pdfs: Optional[int] = None, seconds: Optional[float] = None) -> None:
+  global _capture
+  with _lock:
+    if _capture is not None:
+      return
+    _capture = ProfileCapture(pdfs, seconds)
+  limit = f"{pdfs} PDF(s)" if pdfs is not None else ""
+  limit += (" or " if limit and seconds else "") + (f"{seconds:.0f}s" if seconds else "")
+  print(f"[profile] capture started for {limit} → {_capture.out_dir}")
+
+def stop_capture() -> None:
+  global _capture
+  with _lock:
+    capture, _capture = _capture, None
+  if capture is not None:
+    capture.dump()
+
+def worker_profile_path(name: str) -> Optional[str]:
+  """Where an extraction worker should dump its cProfile for `name`, or None when not capturing."""
+  capture = _capture
+  if capture is None:
+    return None
+  stem = os.path.splitext(os.path.basename(name))[0]
+  return os.path.join(capture.out_dir, f"extract-{time.time_ns()}-{stem}.prof")
+
+def pdf_done() -> None:
+  """A PDF left the pipeline; counts toward a "pdfs=N" capture."""
+  capture = _capture
+  if capture is not None:
+    capture.done_pdfs += 1
+    if capture.finished():
+      stop_capture()
+
+def run_profiled(path: Optional[str], fn, *args, **kwargs):
+  """fn(*args, **kwargs), under cProfile dumped to `path` when a path is given (usable in any process)."""
+  if not path:
+    return fn(*args, **kwargs)
+  prof = cProfile.Profile()
+  try:
+    return prof.runcall(fn, *args, **kwargs)
+  finally:
+    try:
+      prof.dump_stats(path)
+    except OSError as e:
+      print(f"[profile] could not write {path}: {e}")
+
+def _control_loop() -> None:
+  while True:
+    time.sleep(_CHECK_SECONDS)
+    try:
+      if _signalled.is_set():
+        _signalled.clear()
+        if _capture is not None:
+          stop_capture()
+        else:
+          start_capture(PROFILE_PDFS)
+      if PROFILE_CONTROL_FILE and os.path.exists(PROFILE_CONTROL_FILE):
+        with open(PROFILE_CONTROL_FILE, encoding="utf-8") as f:
+          request = f.read()
+        os.remove(PROFILE_CONTROL_FILE)
+        if _capture is None:
+          start_capture(*_parse_request(request))
+        else:
+          print("[profile] a capture is already running")
+      capture = _capture
+      if capture is not None and capture.finished():
+        stop_capture()
+    except Exception as e:
+      print(f"[profile] control error: {e}")
+
+def start_control() -> None:
+  """Watch the control file (and SIGUSR1 where available) from a daemon thread."""
+  if hasattr(signal, "SIGUSR1") and threading.current_thread() is threading.main_thread():
+    signal.signal(signal.SIGUSR1, lambda signum, frame: _signalled.set())
+  threading.Thread(target=_control_loop, name="profile-control", daemon=True).start()